@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del paso ancho → largo de download_batch (reshape_prices) frente al
+bucle por ticker anterior, con frames sintéticos con la forma de yf.download
+(group_by="ticker") para 60, 600 y 3.000 tickers.
+
+Uso:
+    python benchmark_download_batch.py [--dias 250] [--repeticiones 3]
+
+Comprueba además que ambas versiones devuelven las mismas filas.
+"""
+
+import argparse, os, time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# El módulo lee la configuración de Snowflake al importarse; el benchmark no conecta
+for _var in ("SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "SNOWFLAKE_ACCOUNT",
+             "SNOWFLAKE_WAREHOUSE", "SNOWFLAKE_DATABASE", "SNOWFLAKE_SCHEMA"):
+    os.environ.setdefault(_var, "")
+
+from tickers_precios_global import PRICE_COLS, reshape_prices
+
+
+def frame_sintetico(n_tickers: int, dias: int, seed: int = 0) -> Tuple[pd.DataFrame, List[str]]:
+    rnd = np.random.default_rng(seed)
+    tickers = [f"T{i:04d}.MC" for i in range(n_tickers)]
+    campos = ["Adj Close", "Close", "High", "Low", "Open", "Volume"]
+    fechas = pd.bdate_range("2020-01-01", periods=dias, name="Date")
+    datos = rnd.uniform(1, 100, size=(dias, n_tickers * len(campos)))
+    datos[rnd.random(datos.shape) < 0.02] = np.nan  # huecos como festivos locales o datos ausentes
+    columnas = pd.MultiIndex.from_product([tickers, campos], names=["Ticker", "Price"])
+    df = pd.DataFrame(datos, index=fechas, columns=columnas)
+    volumen = df.columns.get_level_values(1) == "Volume"
+    df.loc[:, volumen] = (df.loc[:, volumen] * 1000).round()
+    return df, tickers
+
+def reshape_loop(df: pd.DataFrame, tickers: list) -> pd.DataFrame:
+    """Versión anterior de download_batch: slice, reset_index y rename por ticker."""
+    rows = []
+    for t in tickers:
+        if t not in df.columns.get_level_values(0):
+            continue
+        dft = df[t].reset_index().rename(columns={
+            "Date":"FECHA","Open":"OPEN","High":"HIGH","Low":"LOW","Close":"CLOSE","Volume":"VOLUME","Adj Close":"ADJ_CLOSE"
+        })
+        dft["TICKER"] = t
+        rows.append(dft[PRICE_COLS])
+    out = pd.concat(rows, ignore_index=True).dropna(subset=["CLOSE"])
+    out["FECHA"] = pd.to_datetime(out["FECHA"]).dt.date
+    for col in ["CLOSE","HIGH","LOW","OPEN","ADJ_CLOSE"]:
+        out[col] = pd.to_numeric(out[col], errors="coerce")
+    out["VOLUME"] = pd.to_numeric(out["VOLUME"], errors="coerce").astype("Int64")
+    return out.dropna(subset=["CLOSE","HIGH","LOW","OPEN"])
+
+def medir(fn, df, tickers, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn(df, tickers)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+def ordenar(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(["TICKER", "FECHA"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dias", type=int, default=250)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'tickers':>8} {'filas':>10} {'bucle (s)':>10} {'stack (s)':>10} {'aceleración':>12}  iguales")
+    for n in (60, 600, 3000):
+        df, tickers = frame_sintetico(n, args.dias)
+        iguales = ordenar(reshape_loop(df, tickers)).equals(ordenar(reshape_prices(df, tickers)))
+        t_loop = medir(reshape_loop, df, tickers, args.repeticiones)
+        t_stack = medir(reshape_prices, df, tickers, args.repeticiones)
+        filas = len(reshape_prices(df, tickers))
+        print(f"{n:>8} {filas:>10} {t_loop:>10.3f} {t_stack:>10.3f} {t_loop / t_stack:>11.1f}x  {iguales}")
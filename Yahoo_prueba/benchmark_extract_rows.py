@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de extract_rows_precise: camino rápido (lxml + XPath) frente al
+recorrido original con BeautifulSoup, sobre páginas de componentes guardadas.
+
+Uso:
+    python benchmark_extract_rows.py --guardar          # descarga las 8 páginas a --dir
+    python benchmark_extract_rows.py [--dir paginas_tv] [--repeticiones 5]
+
+Sin páginas guardadas usa páginas sintéticas con la estructura de TradingView.
+Comprueba además que ambos caminos devuelven exactamente las mismas filas.
+"""
+
+import argparse, glob, os, random, time
+
+# El módulo lee la configuración de Snowflake al importarse; el benchmark no conecta
+for _var in ("SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "SNOWFLAKE_ACCOUNT",
+             "SNOWFLAKE_WAREHOUSE", "SNOWFLAKE_DATABASE", "SNOWFLAKE_SCHEMA"):
+    os.environ.setdefault(_var, "")
+
+from tickers_precios_global import INDEX_SPECS, fetch_html, extract_rows_precise
+
+
+def _archivo(spec, directorio):
+    return os.path.join(directorio, f"{spec['index'].replace(' ', '_')}.html")
+
+def guardar_paginas(directorio):
+    os.makedirs(directorio, exist_ok=True)
+    for spec in INDEX_SPECS:
+        with open(_archivo(spec, directorio), "w", encoding="utf-8") as f:
+            f.write(fetch_html(spec["components_url"]))
+        print(f"Guardada {spec['index']}")
+
+def paginas_guardadas(directorio):
+    specs = {_archivo(spec, directorio): spec for spec in INDEX_SPECS}
+    paginas = []
+    for ruta in sorted(glob.glob(os.path.join(directorio, "*.html"))):
+        with open(ruta, encoding="utf-8") as f:
+            paginas.append((f.read(), specs.get(ruta, INDEX_SPECS[0])["accept_exchanges"]))
+    return paginas
+
+def paginas_sinteticas(n_filas=100):
+    rnd = random.Random(7)
+    filas = []
+    for i in range(n_filas):
+        sym = "".join(rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rnd.randint(2, 5)))
+        filas.append(
+            f'<tr class="row-RdUXZpkv listRow" data-rowkey="LSE:{sym}">'
+            f'<td class="cell-RLhfr_y4 left-RLhfr_y4"><div class="wrap-IhQ4N5sj">'
+            f'<span class="tickerCell-GrtoTeat"><img class="logo-PsAlMQQF" src="/logo/{i}.svg">'
+            f'<a class="apply-common-tooltip tickerNameBox-GrtoTeat" href="/symbols/LSE-{sym}/">{sym}</a>'
+            f'<sup class="apply-common-tooltip tickerDescription-GrtoTeat">Company {i} <b>plc</b></sup>'
+            f'</span></div></td>' + "".join(f'<td class="cell-RLhfr_y4 right-RLhfr_y4">{rnd.random():.2f}</td>' for _ in range(9))
+            + "</tr>"
+        )
+    relleno = "<div class='menu-item'>" + "<span>x</span>" * 3000 + "</div>"
+    html = (f"<html><head><title>FTSE 100 components</title><script>{'var a=1;' * 4000}</script></head>"
+            f"<body>{relleno}<table class='table-Ngq2xrcG'><tbody>{''.join(filas)}</tbody></table>{relleno}</body></html>")
+    return [(html, {"LSE"})]
+
+def medir(paginas, fast, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for html, accept in paginas:
+            extract_rows_precise(html, accept, fast=fast)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor / len(paginas)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dir", default="paginas_tv")
+    ap.add_argument("--guardar", action="store_true", help="Descarga y guarda las páginas de componentes.")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.guardar:
+        guardar_paginas(args.dir)
+
+    paginas = paginas_guardadas(args.dir)
+    origen = f"guardadas en {args.dir}"
+    if not paginas:
+        paginas = paginas_sinteticas()
+        origen = "sintéticas"
+    print(f"{len(paginas)} páginas ({origen})")
+
+    distintas = sum(extract_rows_precise(h, a, fast=True) != extract_rows_precise(h, a, fast=False) for h, a in paginas)
+    print(f"Páginas con filas distintas entre caminos: {distintas}")
+
+    t_bs4 = medir(paginas, False, args.repeticiones)
+    t_fast = medir(paginas, True, args.repeticiones)
+    print(f" bs4 : {t_bs4 * 1000:8.1f} ms/página")
+    print(f"lxml : {t_fast * 1000:8.1f} ms/página")
+    print(f"Aceleración: x{t_bs4 / t_fast:.1f}")
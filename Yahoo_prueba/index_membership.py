@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Pertenencia histórica (point-in-time) de tickers a índices.
+
+La tabla INDEX_MEMBERSHIP (la rellena tickers_precios_global.py con el raspado
+diario de TradingView) guarda un intervalo [VALID_FROM, VALID_TO) por
+(INDICE, TICKER_YAHOO); VALID_TO nulo significa "sigue en el índice".
+
+MembershipIndex carga esos intervalos en memoria y responde sin ir a Snowflake:
+    idx = MembershipIndex.from_snowflake(conn, "TFM.YAHOO_FINANCE.INDEX_MEMBERSHIP")
+    idx.members_on("IBEX 35", date(2022, 3, 1))            # frozenset de tickers
+    idx.was_member("IBEX 35", "SAN.MC", date(2022, 3, 1))  # bool
+    idx.intervals_between("IBEX 35", d0, d1)               # [(ticker, desde, hasta_excl)]
+    idx.constituent_days("IBEX 35", d0, d1, fechas)        # (fecha, ticker) por sesión
+
+Ojo: antes del primer raspado no hay historia; VALID_FROM es la primera vez
+que se observó al ticker en el índice.
+"""
+
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+OPEN_END = date.max
+
+
+class MembershipIndex:
+    def __init__(self, rows: Iterable[Tuple[str, str, date, Optional[date]]]):
+        # indice -> ticker -> [(desde, hasta_excl)] ordenados
+        self._intervals: Dict[str, Dict[str, List[Tuple[date, date]]]] = {}
+        for indice, ticker, valid_from, valid_to in rows:
+            self._intervals.setdefault(indice, {}).setdefault(ticker, []).append((valid_from, valid_to or OPEN_END))
+        for por_ticker in self._intervals.values():
+            for ivs in por_ticker.values():
+                ivs.sort()
+
+        # Composición como función escalonada: fechas de cambio ordenadas y el conjunto vigente
+        # desde cada una, así members_on es una búsqueda binaria
+        self._steps: Dict[str, Tuple[List[date], List[FrozenSet[str]]]] = {}
+        for indice, por_ticker in self._intervals.items():
+            cambios: Dict[date, List[Tuple[int, str]]] = {}
+            for ticker, ivs in por_ticker.items():
+                for desde, hasta in ivs:
+                    cambios.setdefault(desde, []).append((1, ticker))
+                    if hasta != OPEN_END:
+                        cambios.setdefault(hasta, []).append((-1, ticker))
+            fechas, conjuntos, actual = [], [], set()
+            for d in sorted(cambios):
+                for signo, ticker in sorted(cambios[d]):  # salidas antes que entradas
+                    if signo > 0:
+                        actual.add(ticker)
+                    else:
+                        actual.discard(ticker)
+                fechas.append(d)
+                conjuntos.append(frozenset(actual))
+            self._steps[indice] = (fechas, conjuntos)
+
+    @classmethod
+    def from_snowflake(cls, conn, table: str) -> "MembershipIndex":
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT INDICE, TICKER_YAHOO, VALID_FROM, VALID_TO FROM {table}")
+            return cls(cur.fetchall())
+
+    @property
+    def indices(self) -> List[str]:
+        return sorted(self._intervals)
+
+    def members_on(self, indice: str, d: date) -> FrozenSet[str]:
+        fechas, conjuntos = self._steps.get(indice, ([], []))
+        i = bisect_right(fechas, d)
+        return conjuntos[i - 1] if i else frozenset()
+
+    def was_member(self, indice: str, ticker: str, d: date) -> bool:
+        return ticker in self.members_on(indice, d)
+
+    def intervals_between(self, indice: str, start: date, end: date) -> List[Tuple[str, date, date]]:
+        """Intervalos [desde, hasta_excl) recortados a [start, end] (ambos incluidos)."""
+        end_excl = end + timedelta(days=1)
+        out = []
+        for ticker, ivs in self._intervals.get(indice, {}).items():
+            for desde, hasta in ivs:
+                a, b = max(desde, start), min(hasta, end_excl)
+                if a < b:
+                    out.append((ticker, a, b))
+        return sorted(out, key=lambda x: (x[1], x[0]))
+
+    def constituent_days(self, indice: str, start: date, end: date,
+                         dates: Optional[Iterable[date]] = None) -> Iterator[Tuple[date, str]]:
+        """
+        (fecha, ticker) de cada día del rango en que el ticker pertenecía al índice.
+        `dates` permite limitarlo a sesiones (p. ej. las fechas de INDEX_DAILY); por defecto, días naturales.
+        """
+        if dates is None:
+            dates = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        fechas, conjuntos = self._steps.get(indice, ([], []))
+        for d in sorted(x for x in dates if start <= x <= end):
+            i = bisect_right(fechas, d)
+            if i:
+                for ticker in sorted(conjuntos[i - 1]):
+                    yield d, ticker
@@ -9,6 +9,8 @@ import yfinance as yf
 import snowflake.connector
 from snowflake.connector.pandas_tools import write_pandas
 
+from trading_calendars import missing_sessions
+
 # === Secrets / ENV ===
 SNOWFLAKE_USER      = os.environ["SNOWFLAKE_USER"]
 SNOWFLAKE_PASSWORD  = os.environ["SNOWFLAKE_PASSWORD"]
@@ -20,19 +22,21 @@ SNOWFLAKE_ROLE      = os.environ.get("SNOWFLAKE_ROLE")
 
 START_DATE = pd.to_datetime(os.environ.get("START_DATE", "2020-01-01")).date()
 INDEX_TABLE = os.environ.get("INDEX_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.INDEX_DAILY")
+WATERMARK_TABLE = os.environ.get("WATERMARK_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.LOAD_WATERMARKS")
+INDEX_DATASET = INDEX_TABLE.split(".")[-1].upper()
 
 TZ = ZoneInfo("Europe/Madrid")
 
 INDEX_SPECS = [
     # market: etiqueta corta que te quedará en la tabla
-    dict(market="IBEX",   index_name="IBEX 35",            pais="España",       symbol="^IBEX"),
-    dict(market="DAX",    index_name="DAX 40",             pais="Alemania",     symbol="^GDAXI"),
-    dict(market="CAC",    index_name="CAC 40",             pais="Francia",      symbol="^FCHI"),
-    dict(market="MIB",    index_name="FTSE MIB",           pais="Italia",       symbol="FTSEMIB.MI"),
-    dict(market="AEX",    index_name="AEX",                pais="Países Bajos", symbol="^AEX"),
-    dict(market="FTSE",   index_name="FTSE 100",           pais="Reino Unido",  symbol="^FTSE"),
-    dict(market="OMXS30", index_name="OMX Stockholm 30",   pais="Suecia",       symbol="^OMXS30"),
-    dict(market="SMI",    index_name="SMI PR",             pais="Suiza",        symbol="^SSMI"),
+    dict(market="IBEX",   index_name="IBEX 35",            pais="España",       symbol="^IBEX",      exchange="BME"),
+    dict(market="DAX",    index_name="DAX 40",             pais="Alemania",     symbol="^GDAXI",     exchange="XETR"),
+    dict(market="CAC",    index_name="CAC 40",             pais="Francia",      symbol="^FCHI",      exchange="EURONEXT"),
+    dict(market="MIB",    index_name="FTSE MIB",           pais="Italia",       symbol="FTSEMIB.MI", exchange="MIL"),
+    dict(market="AEX",    index_name="AEX",                pais="Países Bajos", symbol="^AEX",       exchange="EURONEXT"),
+    dict(market="FTSE",   index_name="FTSE 100",           pais="Reino Unido",  symbol="^FTSE",      exchange="LSE"),
+    dict(market="OMXS30", index_name="OMX Stockholm 30",   pais="Suecia",       symbol="^OMXS30",    exchange="OMXSTO"),
+    dict(market="SMI",    index_name="SMI PR",             pais="Suiza",        symbol="^SSMI",      exchange="SIX"),
 ]
 
 def sf_connect():
@@ -58,14 +62,31 @@ def ensure_table(conn):
     """
     with conn.cursor() as cur:
         cur.execute(ddl)
+        # Marcas de agua compartidas con tickers_precios_global.py (DATASET = nombre de la tabla)
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+          DATASET        STRING,
+          KEY            STRING,
+          LAST_DATE      DATE,
+          LAST_LOADED_AT TIMESTAMP_NTZ
+        )
+        """)
 
 def read_last_dates(conn):
+    # Consulta puntual a la tabla de marcas de agua; solo la primera vez se siembra desde INDEX_DAILY
+    sql = f"SELECT KEY, LAST_DATE FROM {WATERMARK_TABLE} WHERE DATASET = %s"
     with conn.cursor() as cur:
-        try:
-            cur.execute(f"SELECT SYMBOL, MAX(FECHA) FROM {INDEX_TABLE} GROUP BY 1")
-            return {str(s): d for s, d in cur.fetchall() if s}
-        except snowflake.connector.errors.ProgrammingError:
-            return {}
+        cur.execute(sql, (INDEX_DATASET,))
+        rows = cur.fetchall()
+        if not rows:
+            cur.execute(f"""
+            INSERT INTO {WATERMARK_TABLE} (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+            SELECT '{INDEX_DATASET}', SYMBOL, MAX(FECHA), CURRENT_TIMESTAMP()
+            FROM {INDEX_TABLE} GROUP BY SYMBOL
+            """)
+            cur.execute(sql, (INDEX_DATASET,))
+            rows = cur.fetchall()
+    return {str(s): d for s, d in rows if s}
 
 def yesterday_madrid():
     y = (datetime.now(TZ) - timedelta(days=1)).date()
@@ -157,9 +178,26 @@ def merge_chunk(conn, df_chunk: pd.DataFrame):
       INSERT (SYMBOL, MARKET, INDEX_NAME, PAIS, FECHA, OPEN, HIGH, LOW, CLOSE)
       VALUES (s.SYMBOL, s.MARKET, s.INDEX_NAME, s.PAIS, s.FECHA, s.OPEN, s.HIGH, s.LOW, s.CLOSE)
     """
+    watermark_sql = f"""
+    MERGE INTO {WATERMARK_TABLE} w
+    USING (SELECT SYMBOL, MAX(FECHA) AS LAST_DATE FROM TMP_INDEX GROUP BY 1) s
+      ON  w.DATASET = '{INDEX_DATASET}' AND w.KEY = s.SYMBOL
+    WHEN MATCHED THEN UPDATE SET
+      w.LAST_DATE = GREATEST(w.LAST_DATE, s.LAST_DATE), w.LAST_LOADED_AT = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN
+      INSERT (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+      VALUES ('{INDEX_DATASET}', s.SYMBOL, s.LAST_DATE, CURRENT_TIMESTAMP())
+    """
+    # Datos y marca de agua en la misma transacción
     with conn.cursor() as cur:
-        cur.execute(merge_sql)
-        conn.commit()
+        cur.execute("BEGIN")
+        try:
+            cur.execute(merge_sql)
+            cur.execute(watermark_sql)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
     print(f"Subidas/actualizadas: {nrows}")
 
 if __name__ == "__main__":
@@ -176,6 +214,10 @@ if __name__ == "__main__":
             start_d = max(START_DATE, (last[sym] + timedelta(days=1)) if sym in last and last[sym] else START_DATE)
             if start_d > yday:
                 continue
+            # Sin sesiones nuevas en su bolsa (fin de semana, festivo) no se llama a yfinance
+            if not missing_sessions(spec["exchange"], last.get(sym), yday, START_DATE):
+                print(f"{spec['market']} ({sym}): sin sesiones nuevas hasta {yday}.")
+                continue
             print(f"Descargando {spec['market']} ({sym}) desde {start_d} → {yday}")
             df = fetch_index(sym, start_d, end_excl)
             if df.empty:
@@ -4,8 +4,11 @@
 #   pip install beautifulsoup4 lxml yfinance
 #   (opcional) pip install cloudscraper
 
-import os, re, time, random
-from typing import List, Dict, Set, Tuple, Iterable
+import os, re, time, random, threading, queue, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Set, Tuple, Iterable, Optional
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta, date
 from zoneinfo import ZoneInfo
 
@@ -18,6 +21,14 @@ import snowflake.connector
 from snowflake.connector.pandas_tools import write_pandas
 import yfinance as yf
 
+from trading_calendars import exchange_for_ticker, missing_sessions
+
+# lxml para el camino rápido de extract_rows_precise (bs4 como fallback)
+try:
+    from lxml import html as lxml_html
+except Exception:
+    lxml_html = None
+
 # cloudscraper opcional
 try:
     import cloudscraper
@@ -44,6 +55,21 @@ SNOWFLAKE_ROLE      = os.environ.get("SNOWFLAKE_ROLE")                 # opciona
 
 TICKERS_TABLE = os.environ.get("TICKERS_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.LISTA_TICKERS")
 PRICES_TABLE  = os.environ.get("PRICES_TABLE",  f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.TICKERS_INDEX")
+WATERMARK_TABLE  = os.environ.get("WATERMARK_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.LOAD_WATERMARKS")
+PRICES_DATASET   = PRICES_TABLE.split(".")[-1].upper()
+ACTIONS_TABLE    = os.environ.get("CORPORATE_ACTIONS_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.CORPORATE_ACTIONS")
+MEMBERSHIP_TABLE = os.environ.get("MEMBERSHIP_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.INDEX_MEMBERSHIP")
+TICKERS_HISTORY_TABLE = os.environ.get("TICKERS_HISTORY_TABLE", f"{SNOWFLAKE_DATABASE}.{SNOWFLAKE_SCHEMA}.LISTA_TICKERS_HISTORIAL")
+CHUNK_TICKERS  = int(os.environ.get("CHUNK_TICKERS", "60"))    # sub-lotes de tickers para yfinance
+PIPELINE_DEPTH = int(os.environ.get("PIPELINE_DEPTH", "2"))    # lotes descargados en espera de MERGE
+# "staged": lotes a Parquet local → un PUT a stage → un COPY + un MERGE por ejecución
+# "chunk":  write_pandas + MERGE por cada lote de CHUNK_TICKERS
+PRICES_LOAD_MODE = os.environ.get("PRICES_LOAD_MODE", "staged")
+# Relleno único de ADJ_CLOSE en filas anteriores a la columna: tickers recargados por ejecución
+ADJ_BACKFILL_PER_RUN = int(os.environ.get("ADJ_BACKFILL_PER_RUN", "300"))
+ADJ_BACKFILL_DATASET = f"{PRICES_DATASET}_ADJ_CLOSE"
+# Fila de WATERMARK_TABLE (KEY) que marca el relleno de ADJ_CLOSE como terminado
+ADJ_BACKFILL_DONE_KEY = "*"
 START_DATE    = pd.to_datetime(os.environ.get("START_DATE", "2020-01-01")).date()
 TZ = ZoneInfo("Europe/Madrid")
 
@@ -75,6 +101,12 @@ SESSION.headers.update({
 })
 TIMEOUT = 25
 
+# Concurrencia del scraping de componentes: páginas en paralelo, máximo por host
+# y separación mínima entre peticiones a un mismo host (en vez de dormir por fila)
+TV_MAX_WORKERS   = int(os.environ.get("TV_MAX_WORKERS", "4"))
+TV_MAX_PER_HOST  = int(os.environ.get("TV_MAX_PER_HOST", "2"))
+TV_MIN_INTERVAL  = float(os.environ.get("TV_MIN_INTERVAL", "0.5"))
+
 retries = Retry(
     total=5,
     backoff_factor=0.8,
@@ -82,7 +114,7 @@ retries = Retry(
     allowed_methods=["GET"],
     raise_on_status=False,
 )
-adapter = HTTPAdapter(max_retries=retries)
+adapter = HTTPAdapter(max_retries=retries, pool_maxsize=max(10, TV_MAX_WORKERS))
 SESSION.mount("https://", adapter)
 SESSION.mount("http://", adapter)
 
@@ -96,6 +128,25 @@ INVALID_KEYWORDS = (
 
 # ----------------- Utilidades scraping -----------------
 
+_HOST_LOCK = threading.Lock()
+_HOST_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+_HOST_NEXT: Dict[str, float] = {}
+
+# Limita las peticiones simultáneas por host y las espacia TV_MIN_INTERVAL segundos
+@contextmanager
+def host_slot(url: str):
+    host = urlsplit(url).netloc
+    with _HOST_LOCK:
+        slot = _HOST_SLOTS.setdefault(host, threading.BoundedSemaphore(TV_MAX_PER_HOST))
+    with slot:
+        with _HOST_LOCK:
+            now = time.monotonic()
+            turn = max(now, _HOST_NEXT.get(host, now))
+            _HOST_NEXT[host] = turn + TV_MIN_INTERVAL
+        if turn > now:
+            time.sleep(turn - now)
+        yield
+
 # Descarga HTML de TradingView con evasión básica de 403/429.
 # 1) intenta con requests.Session (con retries)
 # 2) si recibe 403/429 repetidos y cloudscraper está disponible, usa cloudscraper como fallback
@@ -105,8 +156,9 @@ def fetch_html(url: str, timeout: int = TIMEOUT, max_retries: int = 6) -> str:
     # Primer intento: SESSION
     for attempt in range(max_retries):
         try:
-            SESSION.headers["User-Agent"] = random.choice(UA_POOL)
-            r = SESSION.get(url, timeout=timeout)
+            # User-Agent por petición: la sesión se comparte entre hilos
+            with host_slot(url):
+                r = SESSION.get(url, timeout=timeout, headers={"User-Agent": random.choice(UA_POOL)})
             if r.status_code == 200 and r.text:
                 return r.text
             last_status = r.status_code
@@ -137,7 +189,8 @@ def fetch_html(url: str, timeout: int = TIMEOUT, max_retries: int = 6) -> str:
                 "Referer": "https://www.tradingview.com/",
                 "Cache-Control": "no-cache",
             }
-            resp = scraper.get(url, headers=headers, timeout=timeout)
+            with host_slot(url):
+                resp = scraper.get(url, headers=headers, timeout=timeout)
             if resp.status_code == 200 and resp.text:
                 return resp.text
             if resp.status_code in (403, 429):
@@ -161,7 +214,28 @@ def class_contains(tag, fragment: str) -> bool:
     return any(fragment in c for c in cls)
 
 # --8<-- [start:extract_rows_precise]
-def extract_rows_precise(html: str, accept_exchanges: Set[str]) -> List[Tuple[str, str, str]]:
+def _rows_fast(html: str) -> List[Tuple[str, str]]:
+    """Camino rápido: una pasada XPath sobre el árbol de lxml, sin BeautifulSoup."""
+    tree = lxml_html.document_fromstring(html)
+    rows = []
+    for sup in tree.xpath("//sup[contains(@class, 'tickerDescription-')]"):
+        # Igual que get_text(strip=True): cada nodo de texto sin espacios y concatenado
+        name = "".join(t.strip() for t in sup.xpath(".//text()"))
+        if not name:
+            continue
+        row = sup
+        for _ in range(8):
+            row = row.getparent()
+            if row is None:
+                break
+            if "row-" in (row.get("class") or ""):
+                href = next((a.get("href") for a in row.iter("a") if a.get("href") is not None), None)
+                if href is not None:
+                    rows.append((href, name))
+                break
+    return rows
+
+def _rows_bs4(html: str) -> List[Tuple[str, str]]:
     soup = BeautifulSoup(html, "lxml")
     desc_nodes = soup.find_all(
         "sup",
@@ -180,13 +254,28 @@ def extract_rows_precise(html: str, accept_exchanges: Set[str]) -> List[Tuple[st
             if class_contains(row, "row-"):
                 a = row.find("a", href=True)
                 if a:
-                    m = HREF_SYMBOL_RE.search(a["href"])
-                    if m:
-                        exch = m.group(1).upper()
-                        sym  = m.group(2)
-                        if exch in accept_exchanges:
-                            rows.append((exch, sym, name))
+                    rows.append((a["href"], name))
                 break
+    return rows
+
+def extract_rows_precise(html: str, accept_exchanges: Set[str], fast: bool = True) -> List[Tuple[str, str, str]]:
+    # Camino rápido con lxml; si no está disponible, falla o no encuentra filas, el recorrido original con bs4
+    candidates = []
+    if fast and lxml_html is not None:
+        try:
+            candidates = _rows_fast(html)
+        except Exception as e:
+            print(f"[extract_rows] lxml falló ({type(e).__name__}: {e}); se usa bs4.")
+    if not candidates:
+        candidates = _rows_bs4(html)
+    rows = []
+    for href, name in candidates:
+        m = HREF_SYMBOL_RE.search(href)
+        if m:
+            exch = m.group(1).upper()
+            sym  = m.group(2)
+            if exch in accept_exchanges:
+                rows.append((exch, sym, name))
     # Limpieza / filtro
     out = {}
     for exch, sym, name in rows:
@@ -233,10 +322,10 @@ def scrape_country(spec: Dict) -> pd.DataFrame:
             "TICKER_YAHOO": yahoo,
             "NOMBRE": clean_company_name(name, sym),
             "PAIS": spec["pais"],
-            "TICKET": base_for_yahoo
+            "TICKET": base_for_yahoo,
+            "INDICE": spec["index"]
         })
-        time.sleep(0.2)  # respeta un poco más a TV
-    return pd.DataFrame(rows, columns=["TICKER_YAHOO", "NOMBRE", "PAIS", "TICKET"])
+    return pd.DataFrame(rows, columns=["TICKER_YAHOO", "NOMBRE", "PAIS", "TICKET", "INDICE"])
 # --8<-- [end:scrape_country]
 
 # ----------------- Snowflake helpers -----------------
@@ -258,23 +347,148 @@ def ensure_db_schema(conn):
         cur.execute(f"USE DATABASE {SNOWFLAKE_DATABASE}")
         cur.execute(f"USE SCHEMA {SNOWFLAKE_SCHEMA}")
 
-def overwrite_tickers(conn, df: pd.DataFrame):
-    if df.empty:
-        raise ValueError("DF de tickers vacío.")
+TICKER_COLS = ["TICKER_YAHOO", "NOMBRE", "PAIS", "TICKET"]
+
+def read_stored_tickers(conn) -> pd.DataFrame:
     with conn.cursor() as cur:
         cur.execute(f"""
             CREATE TABLE IF NOT EXISTS {TICKERS_TABLE} (
                 TICKER_YAHOO STRING, NOMBRE STRING, PAIS STRING, TICKET STRING
             )
         """)
-        cur.execute(f"TRUNCATE TABLE {TICKERS_TABLE}")
-    rows = df[["TICKER_YAHOO","NOMBRE","PAIS","TICKET"]].fillna("").copy()
-    ok, nchunks, nrows, _ = write_pandas(conn, rows, table_name=TICKERS_TABLE.split('.')[-1], quote_identifiers=False)
-    if not ok:
-        raise RuntimeError("write_pandas falló al cargar la tabla de tickers.")
+        cur.execute(f"SELECT TICKER_YAHOO, NOMBRE, PAIS, TICKET FROM {TICKERS_TABLE}")
+        return pd.DataFrame(cur.fetchall(), columns=TICKER_COLS).fillna("")
+
+def diff_tickers(stored: pd.DataFrame, scraped: pd.DataFrame) -> List[Dict]:
+    """
+    Compara el universo guardado con el raspado y devuelve los cambios:
+    ALTA, BAJA, RENOMBRADO (mismo NOMBRE y PAIS con otro ticker) y CAMBIO (mismo ticker, otros datos).
+    Solo se comparan los países presentes en el raspado: un índice que falle no da de baja a todo su país.
+    """
+    stored = stored[stored["PAIS"].isin(set(scraped["PAIS"]))]
+    old = {r.TICKER_YAHOO: r for r in stored.itertuples(index=False)}
+    new = {r.TICKER_YAHOO: r for r in scraped.itertuples(index=False)}
+
+    altas = [new[t] for t in new if t not in old]
+    bajas = [old[t] for t in old if t not in new]
+    changes = []
+
+    # Una baja y una alta con la misma empresa y país se tratan como cambio de ticker
+    bajas_por_empresa: Dict[Tuple[str, str], List] = {}
+    for r in bajas:
+        bajas_por_empresa.setdefault((r.NOMBRE, r.PAIS), []).append(r)
+    for r in altas:
+        candidatas = bajas_por_empresa.get((r.NOMBRE, r.PAIS))
+        if candidatas:
+            prev = candidatas.pop(0)
+            changes.append(dict(ACCION="RENOMBRADO", TICKER_ANTERIOR=prev.TICKER_YAHOO, **r._asdict()))
+        else:
+            changes.append(dict(ACCION="ALTA", TICKER_ANTERIOR=None, **r._asdict()))
+    for r in (r for pendientes in bajas_por_empresa.values() for r in pendientes):
+        changes.append(dict(ACCION="BAJA", TICKER_ANTERIOR=None, **r._asdict()))
+    for t in new.keys() & old.keys():
+        if tuple(new[t]) != tuple(old[t]):
+            changes.append(dict(ACCION="CAMBIO", TICKER_ANTERIOR=None, **new[t]._asdict()))
+    return changes
+
+def sync_tickers(conn, df: pd.DataFrame, today: date) -> List[Dict]:
+    """Aplica solo las diferencias sobre LISTA_TICKERS en una transacción y las registra en el historial."""
+    if df.empty:
+        raise ValueError("DF de tickers vacío.")
+    scraped = df[TICKER_COLS].fillna("").copy()
+    changes = diff_tickers(read_stored_tickers(conn), scraped)
+    if not changes:
+        print("Lista de tickers sin cambios: no se escribe nada.")
+        return changes
+
     with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TICKERS_HISTORY_TABLE} (
+                FECHA DATE, ACCION STRING, TICKER_YAHOO STRING, TICKER_ANTERIOR STRING,
+                NOMBRE STRING, PAIS STRING, TICKET STRING, REGISTRADO_EN TIMESTAMP_NTZ
+            )
+        """)
+        borrar = [c["TICKER_YAHOO"] if c["ACCION"] == "BAJA" else c["TICKER_ANTERIOR"]
+                  for c in changes if c["ACCION"] in ("BAJA", "RENOMBRADO")]
+        insertar = [c for c in changes if c["ACCION"] in ("ALTA", "RENOMBRADO")]
+        actualizar = [c for c in changes if c["ACCION"] == "CAMBIO"]
+        cur.execute("BEGIN")
+        try:
+            if borrar:
+                cur.executemany(f"DELETE FROM {TICKERS_TABLE} WHERE TICKER_YAHOO = %s", [(t,) for t in borrar])
+            if actualizar:
+                cur.executemany(
+                    f"UPDATE {TICKERS_TABLE} SET NOMBRE = %s, PAIS = %s, TICKET = %s WHERE TICKER_YAHOO = %s",
+                    [(c["NOMBRE"], c["PAIS"], c["TICKET"], c["TICKER_YAHOO"]) for c in actualizar],
+                )
+            if insertar:
+                cur.executemany(
+                    f"INSERT INTO {TICKERS_TABLE} (TICKER_YAHOO, NOMBRE, PAIS, TICKET) VALUES (%s, %s, %s, %s)",
+                    [(c["TICKER_YAHOO"], c["NOMBRE"], c["PAIS"], c["TICKET"]) for c in insertar],
+                )
+            cur.executemany(
+                f"""INSERT INTO {TICKERS_HISTORY_TABLE}
+                    (FECHA, ACCION, TICKER_YAHOO, TICKER_ANTERIOR, NOMBRE, PAIS, TICKET, REGISTRADO_EN)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP())""",
+                [(today, c["ACCION"], c["TICKER_YAHOO"], c["TICKER_ANTERIOR"], c["NOMBRE"], c["PAIS"], c["TICKET"])
+                 for c in changes],
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        resumen = {}
+        for c in changes:
+            resumen[c["ACCION"]] = resumen.get(c["ACCION"], 0) + 1
+        print("Cambios en la lista de tickers:", ", ".join(f"{k}={v}" for k, v in sorted(resumen.items())))
         cur.execute(f"SELECT COUNT(*) FROM {TICKERS_TABLE}")
         print("Tickers en tabla:", cur.fetchone()[0])
+    return changes
+
+def update_membership(conn, df: pd.DataFrame, today: date):
+    """
+    Mantiene INDEX_MEMBERSHIP con intervalos [VALID_FROM, VALID_TO) por (INDICE, TICKER_YAHOO):
+    cierra con VALID_TO = hoy los que ya no aparecen y abre uno nuevo para los que entran.
+    Solo se tocan los índices presentes en el raspado de hoy. Lectura: index_membership.py.
+    """
+    members = df[["INDICE", "TICKER_YAHOO"]].drop_duplicates()
+    if members.empty:
+        return
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MEMBERSHIP_TABLE} (
+                INDICE STRING, TICKER_YAHOO STRING, VALID_FROM DATE, VALID_TO DATE
+            )
+        """)
+        cur.execute("CREATE OR REPLACE TEMP TABLE TMP_MEMBERSHIP (INDICE STRING, TICKER_YAHOO STRING)")
+    ok, _, _, _ = write_pandas(conn, members, table_name="TMP_MEMBERSHIP", quote_identifiers=False)
+    if not ok:
+        raise RuntimeError("write_pandas falló al cargar TMP_MEMBERSHIP.")
+    with conn.cursor() as cur:
+        cur.execute("BEGIN")
+        try:
+            cur.execute(f"""
+                UPDATE {MEMBERSHIP_TABLE} m SET VALID_TO = %s
+                WHERE m.VALID_TO IS NULL
+                  AND m.INDICE IN (SELECT DISTINCT INDICE FROM TMP_MEMBERSHIP)
+                  AND NOT EXISTS (SELECT 1 FROM TMP_MEMBERSHIP s
+                                  WHERE s.INDICE = m.INDICE AND s.TICKER_YAHOO = m.TICKER_YAHOO)
+            """, (today,))
+            salidas = cur.rowcount
+            cur.execute(f"""
+                INSERT INTO {MEMBERSHIP_TABLE} (INDICE, TICKER_YAHOO, VALID_FROM, VALID_TO)
+                SELECT s.INDICE, s.TICKER_YAHOO, %s, NULL
+                FROM TMP_MEMBERSHIP s
+                WHERE NOT EXISTS (SELECT 1 FROM {MEMBERSHIP_TABLE} m
+                                  WHERE m.INDICE = s.INDICE AND m.TICKER_YAHOO = s.TICKER_YAHOO
+                                    AND m.VALID_TO IS NULL)
+            """, (today,))
+            entradas = cur.rowcount
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    print(f"Pertenencia a índices: {entradas} entradas, {salidas} salidas ({today}).")
 
 def ensure_prices_table(conn):
     with conn.cursor() as cur:
@@ -286,26 +500,95 @@ def ensure_prices_table(conn):
               LOW    FLOAT,
               OPEN   FLOAT,
               VOLUME NUMBER,
-              FECHA  DATE
+              FECHA  DATE,
+              ADJ_CLOSE FLOAT
             )
         """)
+        # Tablas creadas antes de guardar el cierre ajustado
+        cur.execute(f"ALTER TABLE {PRICES_TABLE} ADD COLUMN IF NOT EXISTS ADJ_CLOSE FLOAT")
+        # Marca de agua por (dataset, clave): última fecha cargada, se mantiene junto a cada MERGE
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+              DATASET        STRING,
+              KEY            STRING,
+              LAST_DATE      DATE,
+              LAST_LOADED_AT TIMESTAMP_NTZ
+            )
+        """)
+        # Dividendos y splits; REFETCHED = FALSE mientras falte recargar el histórico del ticker
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ACTIONS_TABLE} (
+              TICKER STRING, FECHA DATE, TIPO STRING, VALOR FLOAT, DETECTADO_EN TIMESTAMP_NTZ, REFETCHED BOOLEAN
+            )
+        """)
+        cur.execute(f"ALTER TABLE {ACTIONS_TABLE} ADD COLUMN IF NOT EXISTS REFETCHED BOOLEAN DEFAULT TRUE")
 
 def read_tickers(conn) -> List[str]:
     with conn.cursor() as cur:
         cur.execute(f"SELECT TICKER_YAHOO FROM {TICKERS_TABLE} ORDER BY 1")
         return [str(r[0]).strip().upper() for r in cur.fetchall() if r[0]]
 
+def watermark_merge_sql(source: str) -> str:
+    """MERGE de la marca de agua desde una tabla de precios recién cargada (misma transacción)."""
+    return f"""
+        MERGE INTO {WATERMARK_TABLE} w
+        USING (SELECT TICKER, MAX(FECHA) AS LAST_DATE FROM {source} GROUP BY 1) s
+          ON w.DATASET = '{PRICES_DATASET}' AND w.KEY = s.TICKER
+        WHEN MATCHED THEN UPDATE SET
+          w.LAST_DATE = GREATEST(w.LAST_DATE, s.LAST_DATE), w.LAST_LOADED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN
+          INSERT (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+          VALUES ('{PRICES_DATASET}', s.TICKER, s.LAST_DATE, CURRENT_TIMESTAMP())
+    """
+
 def read_last_dates(conn, tickers: List[str]) -> Dict[str, date]:
+    """Última fecha cargada por ticker desde la tabla de marcas de agua (no recorre TICKERS_INDEX)."""
     if not tickers:
         return {}
-    in_list = ",".join(f"'{t}'" for t in tickers)
     with conn.cursor() as cur:
-        try:
-            cur.execute(f"SELECT TICKER, MAX(FECHA) FROM {PRICES_TABLE} WHERE TICKER IN ({in_list}) GROUP BY 1")
+        cur.execute(f"SELECT KEY, LAST_DATE FROM {WATERMARK_TABLE} WHERE DATASET = %s", (PRICES_DATASET,))
+        rows = cur.fetchall()
+        if not rows:
+            # Primera ejecución con marcas de agua: se siembran una sola vez desde la tabla de precios
+            cur.execute(f"""
+                INSERT INTO {WATERMARK_TABLE} (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+                SELECT '{PRICES_DATASET}', TICKER, MAX(FECHA), CURRENT_TIMESTAMP()
+                FROM {PRICES_TABLE} GROUP BY TICKER
+            """)
+            cur.execute(f"SELECT KEY, LAST_DATE FROM {WATERMARK_TABLE} WHERE DATASET = %s", (PRICES_DATASET,))
             rows = cur.fetchall()
-        except snowflake.connector.errors.ProgrammingError:
-            return {}
-    return {str(t).upper(): d for t, d in rows if t}
+    wanted = set(tickers)
+    return {str(t).upper(): d for t, d in rows if t and str(t).upper() in wanted}
+
+def plan_downloads(tickers: List[str], last_dates: Dict[str, date], yday: date) -> Dict[date, List[str]]:
+    """
+    Agrupa los tickers por su ventana de sesiones pendientes (primera, última) en su bolsa y
+    descarta los que no tienen sesiones nuevas (fines de semana, festivos, relanzamientos).
+    Cada grupo se descarga desde la menor marca de agua + 1 de sus tickers: el calendario
+    decide qué pedir, pero no recorta el rango.
+    """
+    windows: Dict[Tuple[date, date], List[str]] = {}
+    starts: Dict[Tuple[date, date], date] = {}
+    skipped = 0
+    for t in tickers:
+        last = last_dates.get(t)
+        start = max(START_DATE, (last + timedelta(days=1)) if last else START_DATE)
+        if start > yday:
+            continue
+        pending = missing_sessions(exchange_for_ticker(t), last, yday, START_DATE)
+        if not pending:
+            skipped += 1
+            continue
+        key = (pending[0], pending[-1])
+        windows.setdefault(key, []).append(t)
+        starts[key] = min(starts.get(key, start), start)
+
+    plan: Dict[date, List[str]] = {}
+    for key, group in windows.items():
+        plan.setdefault(starts[key], []).extend(group)
+    if skipped:
+        print(f"{skipped} tickers sin sesiones nuevas hasta {yday}: no se descargan.")
+    return plan
 
 def chunked(seq: List[str], size: int) -> Iterable[List[str]]:
     for i in range(0, len(seq), size):
@@ -318,40 +601,66 @@ def yesterday_madrid():
 # ----------------- Descarga y MERGE de precios -----------------
 
 # --8<-- [start:download_batch]
-def download_batch(tickers: List[str], start_date, end_excl) -> pd.DataFrame:
-    if not tickers:
-        return pd.DataFrame(columns=["TICKER","CLOSE","HIGH","LOW","OPEN","VOLUME","FECHA"])
-    df = yf.download(
-        tickers, start=start_date, end=end_excl, interval="1d",
-        group_by="ticker", auto_adjust=False, progress=False, threads=True
-    )
-    rows = []
-    for t in tickers:
+PRICE_COLS = ["TICKER","CLOSE","HIGH","LOW","OPEN","VOLUME","FECHA","ADJ_CLOSE"]
+ACTION_COLS = ["TICKER","FECHA","TIPO","VALOR"]
+ACTION_TYPES = {"Dividends": "DIVIDEND", "Stock Splits": "SPLIT"}
+
+def _stack_download(df: pd.DataFrame, tickers: List[str]) -> Optional[pd.DataFrame]:
+    """Pasa la salida ancha de yf.download (ticker, campo) a formato largo con un solo stack."""
+    if df is None or df.empty:
+        return None
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.loc[:, df.columns.get_level_values(0).isin(tickers)]
         try:
-            if isinstance(df.columns, pd.MultiIndex):
-                if t not in df.columns.get_level_values(0):
-                    continue
-                dft = df[t]
-            else:
-                if set(df.columns) & {"Open","High","Low","Close","Volume"}:
-                    dft = df
-                else:
-                    continue
-            dft = dft.reset_index().rename(columns={
-                "Date":"FECHA","Open":"OPEN","High":"HIGH","Low":"LOW","Close":"CLOSE","Volume":"VOLUME"
-            })
-            dft["TICKER"] = t
-            rows.append(dft[["TICKER","CLOSE","HIGH","LOW","OPEN","VOLUME","FECHA"]])
-        except Exception:
-            continue
-    if not rows:
-        return pd.DataFrame(columns=["TICKER","CLOSE","HIGH","LOW","OPEN","VOLUME","FECHA"])
-    out = pd.concat(rows, ignore_index=True).dropna(subset=["CLOSE"])
+            long = df.stack(level=0, future_stack=True)
+        except TypeError:  # pandas < 2.1
+            long = df.stack(level=0)
+    elif set(df.columns) & {"Open","High","Low","Close","Volume"}:
+        long = df.assign(TICKER=tickers[0]).set_index("TICKER", append=True)
+    else:
+        return None
+    long.index = long.index.set_names(["FECHA", "TICKER"])
+    return long
+
+def _prices_from_long(long: Optional[pd.DataFrame]) -> pd.DataFrame:
+    if long is None:
+        return pd.DataFrame(columns=PRICE_COLS)
+    out = long.reset_index().rename(columns={
+        "Open":"OPEN","High":"HIGH","Low":"LOW","Close":"CLOSE","Volume":"VOLUME","Adj Close":"ADJ_CLOSE"
+    }).reindex(columns=PRICE_COLS)
+    out = out.dropna(subset=["CLOSE"])
     out["FECHA"] = pd.to_datetime(out["FECHA"]).dt.date
-    for col in ["CLOSE","HIGH","LOW","OPEN"]:
+    for col in ["CLOSE","HIGH","LOW","OPEN","ADJ_CLOSE"]:
         out[col] = pd.to_numeric(out[col], errors="coerce")
     out["VOLUME"] = pd.to_numeric(out["VOLUME"], errors="coerce").astype("Int64")
-    return out.dropna(subset=["CLOSE","HIGH","LOW","OPEN"])
+    return out.dropna(subset=["CLOSE","HIGH","LOW","OPEN"]).reset_index(drop=True)
+
+def _actions_from_long(long: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Dividendos y splits (valor distinto de 0) en formato (TICKER, FECHA, TIPO, VALOR)."""
+    if long is None or not set(ACTION_TYPES) & set(long.columns):
+        return pd.DataFrame(columns=ACTION_COLS)
+    acts = long.reindex(columns=list(ACTION_TYPES)).reset_index().melt(
+        id_vars=["FECHA", "TICKER"], var_name="TIPO", value_name="VALOR"
+    )
+    acts["VALOR"] = pd.to_numeric(acts["VALOR"], errors="coerce")
+    acts = acts[acts["VALOR"].notna() & (acts["VALOR"] != 0)].copy()
+    acts["TIPO"] = acts["TIPO"].map(ACTION_TYPES)
+    acts["FECHA"] = pd.to_datetime(acts["FECHA"]).dt.date
+    return acts[ACTION_COLS].reset_index(drop=True)
+
+def reshape_prices(df: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+    return _prices_from_long(_stack_download(df, tickers))
+
+def download_batch(tickers: List[str], start_date, end_excl) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Precios y acciones corporativas (dividendos, splits) de la misma llamada a yf.download."""
+    if not tickers:
+        return pd.DataFrame(columns=PRICE_COLS), pd.DataFrame(columns=ACTION_COLS)
+    df = yf.download(
+        tickers, start=start_date, end=end_excl, interval="1d", actions=True,
+        group_by="ticker", auto_adjust=False, progress=False, threads=True
+    )
+    long = _stack_download(df, tickers)
+    return _prices_from_long(long), _actions_from_long(long)
 # --8<-- [end:download_batch]
 
 # --8<-- [start:merge_with_temp]
@@ -359,37 +668,257 @@ def merge_with_temp(conn, df: pd.DataFrame):
     """Carga df a TMP_PRICES con write_pandas y luego MERGE → sin límite de expresiones."""
     if df.empty:
         return
-    df2 = df[["TICKER","CLOSE","HIGH","LOW","OPEN","VOLUME","FECHA"]].copy()
+    df2 = df[PRICE_COLS].copy()
     with conn.cursor() as cur:
         cur.execute(f"CREATE OR REPLACE TEMP TABLE TMP_PRICES LIKE {PRICES_TABLE}")
     ok, nchunks, nrows, _ = write_pandas(conn, df2, table_name="TMP_PRICES", quote_identifiers=False)
     if not ok:
         raise RuntimeError("write_pandas falló al cargar TMP_PRICES.")
-    merge_sql = f"""
+    merge_prices_and_watermarks(conn, "TMP_PRICES")
+
+def merge_prices_and_watermarks(conn, source: str):
+    """MERGE de precios y de marcas de agua en una sola transacción."""
+    with conn.cursor() as cur:
+        cur.execute("BEGIN")
+        try:
+            cur.execute(merge_prices_sql(source))
+            cur.execute(watermark_merge_sql(source))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+def merge_prices_sql(source: str) -> str:
+    return f"""
         MERGE INTO {PRICES_TABLE} t
-        USING TMP_PRICES s
+        USING {source} s
           ON t.TICKER = s.TICKER AND t.FECHA = s.FECHA
         WHEN MATCHED THEN UPDATE SET
-          t.CLOSE = s.CLOSE, t.HIGH = s.HIGH, t.LOW = s.LOW, t.OPEN = s.OPEN, t.VOLUME = s.VOLUME
+          t.CLOSE = s.CLOSE, t.HIGH = s.HIGH, t.LOW = s.LOW, t.OPEN = s.OPEN, t.VOLUME = s.VOLUME,
+          t.ADJ_CLOSE = s.ADJ_CLOSE
         WHEN NOT MATCHED THEN
-          INSERT (TICKER, CLOSE, HIGH, LOW, OPEN, VOLUME, FECHA)
-          VALUES (s.TICKER, s.CLOSE, s.HIGH, s.LOW, s.OPEN, s.VOLUME, s.FECHA)
+          INSERT (TICKER, CLOSE, HIGH, LOW, OPEN, VOLUME, FECHA, ADJ_CLOSE)
+          VALUES (s.TICKER, s.CLOSE, s.HIGH, s.LOW, s.OPEN, s.VOLUME, s.FECHA, s.ADJ_CLOSE)
     """
+
+def merge_staged(conn, spool_dir: str):
+    """Sube todos los Parquet de spool_dir a un stage temporal y hace un único COPY + MERGE."""
+    pattern = os.path.join(os.path.abspath(spool_dir), "*.parquet").replace(os.sep, "/")
     with conn.cursor() as cur:
-        cur.execute(merge_sql)
-        conn.commit()
+        cur.execute("CREATE OR REPLACE TEMPORARY STAGE STG_PRICES FILE_FORMAT = (TYPE = PARQUET)")
+        cur.execute(f"PUT 'file://{pattern}' @STG_PRICES PARALLEL = 8 AUTO_COMPRESS = FALSE")
+        cur.execute(f"CREATE OR REPLACE TEMP TABLE TMP_PRICES LIKE {PRICES_TABLE}")
+        cur.execute("""
+            COPY INTO TMP_PRICES FROM @STG_PRICES
+            FILE_FORMAT = (TYPE = PARQUET)
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            PURGE = TRUE
+        """)
+    merge_prices_and_watermarks(conn, "TMP_PRICES")
 # --8<-- [end:merge_with_temp]
 
+# --8<-- [start:corporate_actions]
+def record_actions(conn, actions: pd.DataFrame, refetched: Set[str]) -> int:
+    """
+    Guarda los dividendos y splits no vistos antes. Los de tickers fuera de `refetched` (cuya
+    serie guardada se descargó antes de la acción) quedan con REFETCHED = FALSE hasta recargarlos.
+    """
+    if actions.empty:
+        return 0
+    acts = actions[ACTION_COLS].drop_duplicates(subset=["TICKER","FECHA","TIPO"]).copy()
+    acts["REFETCHED"] = acts["TICKER"].isin(refetched)
+    with conn.cursor() as cur:
+        cur.execute("CREATE OR REPLACE TEMP TABLE TMP_ACTIONS (TICKER STRING, FECHA DATE, TIPO STRING, VALOR FLOAT, REFETCHED BOOLEAN)")
+    ok, _, _, _ = write_pandas(conn, acts, table_name="TMP_ACTIONS", quote_identifiers=False)
+    if not ok:
+        raise RuntimeError("write_pandas falló al cargar TMP_ACTIONS.")
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {ACTIONS_TABLE} (TICKER, FECHA, TIPO, VALOR, DETECTADO_EN, REFETCHED)
+            SELECT s.TICKER, s.FECHA, s.TIPO, s.VALOR, CURRENT_TIMESTAMP(), s.REFETCHED
+            FROM TMP_ACTIONS s
+            WHERE NOT EXISTS (SELECT 1 FROM {ACTIONS_TABLE} t
+                              WHERE t.TICKER = s.TICKER AND t.FECHA = s.FECHA AND t.TIPO = s.TIPO)
+        """)
+        return cur.fetchone()[0]
+
+def pending_refetch(conn, backfill_limit: int = ADJ_BACKFILL_PER_RUN) -> Tuple[List[str], List[str]]:
+    """
+    Tickers cuyo histórico hay que recargar: los que tienen acciones corporativas con REFETCHED = FALSE
+    (incluidas las de ejecuciones en las que la recarga falló) y un tramo del relleno único de ADJ_CLOSE.
+    Cuando el relleno no encuentra tickers pendientes se marca como terminado y deja de consultarse.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT DISTINCT TICKER FROM {ACTIONS_TABLE} WHERE NOT REFETCHED ORDER BY 1")
+        by_actions = [str(r[0]) for r in cur.fetchall()]
+        cur.execute(f"SELECT 1 FROM {WATERMARK_TABLE} WHERE DATASET = %s AND KEY = %s",
+                    (ADJ_BACKFILL_DATASET, ADJ_BACKFILL_DONE_KEY))
+        if cur.fetchone():
+            return by_actions, []
+        # Una sola pasada por ticker: la marca en WATERMARK_TABLE evita reintentar sin fin los que
+        # Yahoo ya no devuelve (p. ej. excluidos de cotización)
+        cur.execute(f"""
+            SELECT DISTINCT p.TICKER FROM {PRICES_TABLE} p
+            WHERE p.ADJ_CLOSE IS NULL
+              AND NOT EXISTS (SELECT 1 FROM {WATERMARK_TABLE} w WHERE w.DATASET = %s AND w.KEY = p.TICKER)
+            ORDER BY 1
+            LIMIT {int(backfill_limit)}
+        """, (ADJ_BACKFILL_DATASET,))
+        pending = [str(r[0]) for r in cur.fetchall()]
+        if not pending:
+            print("Relleno de ADJ_CLOSE terminado.")
+            cur.execute(f"""
+                INSERT INTO {WATERMARK_TABLE} (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+                VALUES (%s, %s, CURRENT_DATE(), CURRENT_TIMESTAMP())
+            """, (ADJ_BACKFILL_DATASET, ADJ_BACKFILL_DONE_KEY))
+        backfill = [t for t in pending if t not in by_actions]
+    return by_actions, backfill
+
+def mark_refetched(conn, tickers: List[str], yday: date):
+    """Da por recargado el histórico de `tickers`: acciones pendientes y relleno de ADJ_CLOSE."""
+    placeholders = ", ".join(["%s"] * len(tickers))
+    rows = ", ".join(["(%s)"] * len(tickers))
+    with conn.cursor() as cur:
+        cur.execute("BEGIN")
+        try:
+            cur.execute(f"UPDATE {ACTIONS_TABLE} SET REFETCHED = TRUE WHERE NOT REFETCHED AND TICKER IN ({placeholders})", tickers)
+            cur.execute(f"""
+                MERGE INTO {WATERMARK_TABLE} w
+                USING (SELECT column1 AS KEY FROM VALUES {rows}) s
+                  ON w.DATASET = '{ADJ_BACKFILL_DATASET}' AND w.KEY = s.KEY
+                WHEN MATCHED THEN UPDATE SET w.LAST_DATE = %s, w.LAST_LOADED_AT = CURRENT_TIMESTAMP()
+                WHEN NOT MATCHED THEN
+                  INSERT (DATASET, KEY, LAST_DATE, LAST_LOADED_AT)
+                  VALUES ('{ADJ_BACKFILL_DATASET}', s.KEY, %s, CURRENT_TIMESTAMP())
+            """, [*tickers, yday, yday])
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+def refetch_history(conn, tickers: List[str], yday: date, end_excl: date) -> int:
+    """
+    Vuelve a descargar desde START_DATE solo los tickers indicados: Yahoo reescribe hacia atrás
+    Close (splits) y Adj Close (ambos), así que la serie guardada queda obsoleta. Cada lote se da
+    por recargado solo tras su MERGE; si un lote falla se registra y se sigue con el siguiente, y la
+    próxima ejecución lo reintenta (los precios del día ya están confirmados).
+    """
+    total = 0
+    for sub in chunked(sorted(tickers), CHUNK_TICKERS):
+        print(f"Recargando histórico ajustado de {len(sub)} tickers: {', '.join(sub)}")
+        try:
+            prices, actions = download_batch(sub, START_DATE, end_excl)
+            prices = prices[prices["FECHA"] <= yday]
+            merge_with_temp(conn, prices)
+            record_actions(conn, actions[actions["FECHA"] <= yday], refetched=set(sub))
+            mark_refetched(conn, sub, yday)
+        except Exception as e:
+            print(f"[refetch] Falló la recarga de {', '.join(sub)}: {e!r}; se reintentará en la próxima ejecución.")
+            continue
+        total += len(prices)
+    return total
+# --8<-- [end:corporate_actions]
+
+# --8<-- [start:load_prices]
+_END = object()
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    # put con espera acotada: si el consumidor se ha parado, el productor no se queda bloqueado
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def produce_prices(plan: Dict[date, List[str]], yday: date, end_excl: date, q: queue.Queue, stop: threading.Event):
+    try:
+        for start_date, group in sorted(plan.items()):
+            print(f"Descargando {len(group)} tickers desde {start_date} → {yday}")
+            for sub in chunked(group, CHUNK_TICKERS):
+                if stop.is_set():
+                    return
+                part, actions = download_batch(sub, start_date, end_excl)
+                if part.empty:
+                    continue
+                part = part[(part["FECHA"] >= start_date) & (part["FECHA"] <= yday)]
+                actions = actions[(actions["FECHA"] >= start_date) & (actions["FECHA"] <= yday)]
+                if not _put(q, (part, actions), stop):
+                    return
+        _put(q, _END, stop)
+    except BaseException as e:
+        _put(q, e, stop)
+
+def run_pipeline(plan: Dict[date, List[str]], yday: date, end_excl: date, handle, depth: int = PIPELINE_DEPTH) -> int:
+    """
+    Productor/consumidor: un hilo descarga los lotes de yfinance mientras el hilo principal
+    procesa el anterior con handle(part, actions). La cola acotada (depth) frena la descarga si el
+    consumidor va por detrás; un error en cualquiera de los dos lados detiene al otro.
+    """
+    q: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_prices, args=(plan, yday, end_excl, q, stop),
+                                name="descarga-precios", daemon=True)
+    producer.start()
+    total_rows = 0
+    try:
+        while True:
+            item = q.get()
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                raise RuntimeError("Fallo en la descarga de precios.") from item
+            part, actions = item
+            handle(part, actions)
+            total_rows += len(part)
+    finally:
+        stop.set()
+        producer.join()
+    return total_rows
+
+def load_prices(conn, plan: Dict[date, List[str]], yday: date, end_excl: date,
+                depth: int = PIPELINE_DEPTH, mode: str = PRICES_LOAD_MODE) -> Tuple[int, pd.DataFrame]:
+    """Carga los precios del plan y devuelve (filas, acciones corporativas de la ventana descargada)."""
+    collected: List[pd.DataFrame] = []
+    def collect(actions: pd.DataFrame):
+        if not actions.empty:
+            collected.append(actions)
+    def all_actions() -> pd.DataFrame:
+        return pd.concat(collected, ignore_index=True) if collected else pd.DataFrame(columns=ACTION_COLS)
+
+    if mode != "staged":
+        # Un write_pandas + MERGE por lote (sin límite de expresiones)
+        def merge_part(part: pd.DataFrame, actions: pd.DataFrame):
+            merge_with_temp(conn, part)
+            collect(actions)
+        return run_pipeline(plan, yday, end_excl, merge_part, depth), all_actions()
+
+    # Los lotes se acumulan en Parquet local y Snowflake solo trabaja una vez al final
+    with tempfile.TemporaryDirectory(prefix="precios_") as spool:
+        files: List[str] = []
+        def spool_part(part: pd.DataFrame, actions: pd.DataFrame):
+            path = os.path.join(spool, f"part_{len(files):05d}.parquet")
+            part[PRICE_COLS].to_parquet(path, index=False)
+            files.append(path)
+            collect(actions)
+        total_rows = run_pipeline(plan, yday, end_excl, spool_part, depth)
+        if files:
+            print(f"Cargando {total_rows} filas ({len(files)} ficheros Parquet) con un COPY + MERGE...")
+            merge_staged(conn, spool)
+    return total_rows, all_actions()
+# --8<-- [end:load_prices]
+
 # ----------------- MAIN -----------------
 if __name__ == "__main__":
-    # 1) SCRAPE TICKERS
-    frames = []
-    for spec in INDEX_SPECS:
-        print(f"Raspando {spec['index']} ({spec['pais']}) ...")
-        df_country = scrape_country(spec)
-        print(f" - {spec['pais']}: {len(df_country)} tickers (OK)")
-        frames.append(df_country)
-    tick_df = pd.concat(frames, ignore_index=True).rename(columns=str.upper)
+    # 1) SCRAPE TICKERS (páginas de componentes en paralelo; el ritmo lo marca host_slot)
+    print(f"Raspando {len(INDEX_SPECS)} índices con {TV_MAX_WORKERS} hilos (máx. {TV_MAX_PER_HOST} por host)...")
+    with ThreadPoolExecutor(max_workers=TV_MAX_WORKERS) as ex:
+        frames = list(ex.map(scrape_country, INDEX_SPECS))
+    for spec, df_country in zip(INDEX_SPECS, frames):
+        print(f" - {spec['index']} ({spec['pais']}): {len(df_country)} tickers (OK)")
+    members_df = pd.concat(frames, ignore_index=True)
+    tick_df = members_df.rename(columns=str.upper)
     tick_df = tick_df.drop_duplicates(subset=["TICKER_YAHOO"]).reset_index(drop=True)
 
     # 2) CONEXIÓN SNOWFLAKE
@@ -407,8 +936,10 @@ if __name__ == "__main__":
     with conn:
         ensure_db_schema(conn)
 
-        # 3) Sobrescribe lista de tickers (TRUNCATE + write_pandas)
-        overwrite_tickers(conn, tick_df)
+        # 3) Aplica solo las altas/bajas/cambios sobre la lista de tickers (sin TRUNCATE)
+        today = datetime.now(TZ).date()
+        sync_tickers(conn, tick_df, today)
+        update_membership(conn, members_df, today)
 
         # 4) Precios incrementales (2020 si no hay datos; si hay, desde max(FECHA)+1 hasta ayer)
         ensure_prices_table(conn)
@@ -416,23 +947,22 @@ if __name__ == "__main__":
         last_dates = read_last_dates(conn, tickers)
         yday, end_excl = yesterday_madrid()
 
-        # Plan por fecha de inicio
-        plan: Dict[date, List[str]] = {}
-        for t in tickers:
-            last = last_dates.get(t)
-            start = max(START_DATE, (last + timedelta(days=1)) if last else START_DATE)
-            if start <= yday:
-                plan.setdefault(start, []).append(t)
-
-        total_rows = 0
-        for start_date, group in sorted(plan.items()):
-            print(f"Descargando {len(group)} tickers desde {start_date} → {yday}")
-            for sub in chunked(group, 60):  # sub-lotes de tickers para yfinance
-                part = download_batch(sub, start_date, end_excl)
-                if part.empty:
-                    continue
-                part = part[(part["FECHA"] >= start_date) & (part["FECHA"] <= yday)]
-                merge_with_temp(conn, part)   # write_pandas + MERGE (sin límite)
-                total_rows += len(part)
+        # Plan por ventana de sesiones pendientes según el calendario de cada bolsa
+        plan = plan_downloads(tickers, last_dates, yday)
+
+        # Descarga del lote N+1 en paralelo al MERGE del lote N
+        total_rows, actions = load_prices(conn, plan, yday, end_excl)
+
+        # 5) Acciones corporativas: solo se recarga el histórico de los tickers con un split o
+        #    dividendo nuevo que ya tenían datos previos (los demás se acaban de descargar enteros),
+        #    más un tramo del relleno único de ADJ_CLOSE
+        record_actions(conn, actions, refetched={t for t in tickers if not last_dates.get(t)})
+        by_actions, backfill = pending_refetch(conn)
+        if by_actions:
+            print(f"{len(by_actions)} tickers con acciones corporativas pendientes de recarga.")
+        if backfill:
+            print(f"Relleno de ADJ_CLOSE: {len(backfill)} tickers en esta ejecución.")
+        if by_actions or backfill:
+            total_rows += refetch_history(conn, by_actions + backfill, yday, end_excl)
 
         print("✅ Filas nuevas/actualizadas:", total_rows)
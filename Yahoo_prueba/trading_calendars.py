@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Calendarios de sesiones de las bolsas de los índices (BME, XETR, Euronext, MIL,
+LSE, OMXSTO, SIX), asociados a cada ticker por su yahoo_suffix.
+
+Si está instalado `exchange_calendars` se usan sus calendarios (incluyen cierres
+extraordinarios); si no, reglas propias: fines de semana, festivos fijos y
+festivos ligados a la Pascua de cada mercado.
+
+Los planificadores solo lo usan para decidir si hay sesiones nuevas y agrupar
+tickers: el rango pedido a yfinance sigue empezando en la marca de agua + 1,
+así un festivo mal clasificado como mucho retrasa una descarga, nunca la pierde.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+
+# exchange_calendars opcional
+try:
+    import exchange_calendars as xcals
+except Exception:
+    xcals = None
+
+EXCHANGE_BY_SUFFIX = {
+    ".MC": "BME",
+    ".DE": "XETR",
+    ".PA": "EURONEXT",
+    ".AS": "EURONEXT",
+    ".MI": "MIL",
+    ".L":  "LSE",
+    ".ST": "OMXSTO",
+    ".SW": "SIX",
+}
+
+# Código ISO de mercado en exchange_calendars
+XCALS_CODE = {
+    "BME": "XMAD", "XETR": "XETR", "EURONEXT": "XPAR", "MIL": "XMIL",
+    "LSE": "XLON", "OMXSTO": "XSTO", "SIX": "XSWX",
+}
+
+
+def exchange_for_ticker(ticker: str) -> Optional[str]:
+    t = ticker.upper()
+    for suffix, exchange in EXCHANGE_BY_SUFFIX.items():
+        if t.endswith(suffix):
+            return exchange
+    return None
+
+def _easter(year: int) -> date:
+    # Algoritmo anónimo gregoriano (Meeus/Jones/Butcher)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+def _weekday_on_or_before(d: date, weekday: int) -> date:
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+def _uk_bank_holidays(year: int) -> set:
+    def substitute(d: date, taken: set) -> date:
+        while d.weekday() >= 5 or d in taken:
+            d += timedelta(days=1)
+        return d
+    days = set()
+    days.add(substitute(date(year, 1, 1), days))
+    days.add(substitute(date(year, 12, 25), days))
+    days.add(substitute(date(year, 12, 26), days))
+    days.add(_weekday_on_or_before(date(year, 5, 7), 0))    # primer lunes de mayo
+    days.add(_weekday_on_or_before(date(year, 5, 31), 0))   # último lunes de mayo
+    days.add(_weekday_on_or_before(date(year, 8, 31), 0))   # último lunes de agosto
+    return days
+
+@lru_cache(maxsize=None)
+def _rule_holidays(exchange: str, year: int) -> FrozenSet[date]:
+    easter = _easter(year)
+    good_friday, easter_monday = easter - timedelta(days=2), easter + timedelta(days=1)
+    # Calendario TARGET: base de BME y Euronext
+    days = {date(year, 1, 1), good_friday, easter_monday, date(year, 5, 1), date(year, 12, 25), date(year, 12, 26)}
+    if exchange == "XETR":
+        days |= {date(year, 12, 24), date(year, 12, 31)}
+    elif exchange == "MIL":
+        days |= {date(year, 8, 15), date(year, 12, 24), date(year, 12, 31)}
+    elif exchange == "LSE":
+        days = _uk_bank_holidays(year) | {good_friday, easter_monday}
+    elif exchange == "OMXSTO":
+        midsummer_eve = _weekday_on_or_before(date(year, 6, 25), 4)
+        days |= {date(year, 1, 6), easter + timedelta(days=39), date(year, 6, 6),
+                 midsummer_eve, date(year, 12, 24), date(year, 12, 31)}
+    elif exchange == "SIX":
+        days |= {date(year, 1, 2), easter + timedelta(days=39), easter + timedelta(days=50),
+                 date(year, 8, 1), date(year, 12, 24), date(year, 12, 31)}
+    return frozenset(days)
+
+@lru_cache(maxsize=None)
+def _xcals_calendar(exchange: str):
+    return xcals.get_calendar(XCALS_CODE[exchange])
+
+def sessions(exchange: Optional[str], start: date, end: date) -> List[date]:
+    """Sesiones de `exchange` entre start y end (incluidos). Mercado desconocido: días laborables."""
+    return list(_sessions(exchange, start, end))
+
+@lru_cache(maxsize=4096)
+def _sessions(exchange: Optional[str], start: date, end: date) -> tuple:
+    if start > end:
+        return ()
+    if xcals is not None and exchange in XCALS_CODE:
+        try:
+            cal = _xcals_calendar(exchange)
+            return tuple(ts.date() for ts in cal.sessions_in_range(start.isoformat(), end.isoformat()))
+        except Exception:
+            pass  # fuera del rango del calendario: reglas propias
+    out, d = [], start
+    while d <= end:
+        if d.weekday() < 5 and (exchange is None or d not in _rule_holidays(exchange, d.year)):
+            out.append(d)
+        d += timedelta(days=1)
+    return tuple(out)
+
+def is_session(exchange: Optional[str], d: date) -> bool:
+    return bool(sessions(exchange, d, d))
+
+def missing_sessions(exchange: Optional[str], last_loaded: Optional[date], until: date, first: date) -> List[date]:
+    """Sesiones posteriores a last_loaded (o desde first si no hay datos) hasta until."""
+    start = max(first, last_loaded + timedelta(days=1)) if last_loaded else first
+    return sessions(exchange, start, until)
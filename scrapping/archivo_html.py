@@ -0,0 +1,91 @@
+# archivo_html.py
+
+"""
+Archivo de HTML crudo de los snapshots, un fichero por noticiero y mes
+(ARCHIVO_HTML_DIR/<FUENTE>/<AAAAMM>.zst, o .gz si zstandard no está instalado).
+
+Cada página se añade como un frame comprimido independiente con una cabecera
+JSON de una línea (fecha, url, bytes) seguida del HTML, de modo que el fichero
+crece solo por append y se puede leer en streaming de principio a fin.
+"""
+
+import gzip
+import json
+import os
+import threading
+
+from config import ARCHIVO_HTML_DIR
+
+# zstandard opcional: si no está disponible se usan miembros gzip concatenados
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+EXTENSION = ".zst" if zstandard is not None else ".gz"
+
+_lock_archivo = threading.Lock()
+
+
+def _carpeta_fuente(fuente):
+    return (fuente or "GENERAL").replace(" ", "_")
+
+def ruta_archivo(fuente, fecha_str, directorio=ARCHIVO_HTML_DIR):
+    return os.path.join(directorio, _carpeta_fuente(fuente), f"{fecha_str[:6]}{EXTENSION}")
+
+def _comprimir(datos):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(datos)
+    return gzip.compress(datos)
+
+def archivar_html(fuente, fecha_str, url, html, directorio=ARCHIVO_HTML_DIR):
+    cabecera = json.dumps({"fecha": fecha_str, "url": url, "bytes": len(html)}).encode("utf-8")
+    frame = _comprimir(cabecera + b"\n" + html)
+    ruta = ruta_archivo(fuente, fecha_str, directorio)
+    with _lock_archivo:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "ab") as f:
+            f.write(frame)
+
+def leer_archivo(ruta):
+    """Itera (fecha_str, url, html) de un fichero mensual, en orden de escritura."""
+    if ruta.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Instala 'zstandard' para leer {ruta}.")
+        f = zstandard.ZstdDecompressor().stream_reader(open(ruta, "rb"), read_across_frames=True, closefd=True)
+    else:
+        f = gzip.open(ruta, "rb")
+    with f:
+        while True:
+            linea = b""
+            while not linea.endswith(b"\n"):
+                c = f.read(1)
+                if not c:
+                    return
+                linea += c
+            cabecera = json.loads(linea)
+            partes, pendiente = [], cabecera["bytes"]
+            while pendiente:
+                parte = f.read(pendiente)
+                if not parte:
+                    raise EOFError(f"Registro truncado en {ruta} ({cabecera['fecha']}).")
+                partes.append(parte)
+                pendiente -= len(parte)
+            html = b"".join(partes)
+            yield cabecera["fecha"], cabecera["url"], html
+
+def listar_archivos(directorio=ARCHIVO_HTML_DIR, fuentes=None, desde=None, hasta=None):
+    """Devuelve [(fuente_carpeta, aaaamm, ruta)] filtrado por fuentes y meses (AAAAMM)."""
+    archivos = []
+    if not os.path.isdir(directorio):
+        return archivos
+    carpetas = {_carpeta_fuente(f) for f in fuentes} if fuentes else None
+    for carpeta in sorted(os.listdir(directorio)):
+        if carpetas is not None and carpeta not in carpetas:
+            continue
+        for nombre in sorted(os.listdir(os.path.join(directorio, carpeta))):
+            mes, ext = os.path.splitext(nombre)
+            if ext not in (".zst", ".gz") or (desde and mes < desde) or (hasta and mes > hasta):
+                continue
+            archivos.append((carpeta, mes, os.path.join(directorio, carpeta, nombre)))
+    return archivos
@@ -0,0 +1,99 @@
+# benchmark_parser.py
+
+"""
+Micro-benchmark de los motores de extracción de encabezados.
+
+Usa los snapshots guardados en la caché local (CACHE_DIR/blobs). Si la caché
+está vacía genera páginas sintéticas del tamaño de una portada real.
+Comprueba además que ambos motores devuelven exactamente los mismos encabezados,
+tanto en esas páginas como en CASOS_LIMITE (bloques dentro de un encabezado, que
+libxml2 cierra antes de tiempo).
+
+Uso:
+    python benchmark_parser.py [--paginas 50] [--repeticiones 3]
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import random
+import time
+
+from config import CACHE_DIR
+from scraper import MOTORES_ENCABEZADOS
+
+CASOS_LIMITE = [
+    "<h2><p>Texto del titular aqui</p></h2>",
+    "<h3 class='t'><table><tr><td>Uno dos tres cuatro</td></tr></table></h3>",
+    "<h2><li>Titular dentro de una lista</li></h2>",
+    "<h1><form><span>Titular dentro de un formulario</span></form></h1>",
+    "<H2><fieldset>Titular dentro de un fieldset</fieldset></H2>",
+    "<h2><div><p>Titular en bloques anidados</p></div></h2><p>Entradilla</p>",
+    "<h2>Antes<p>del bloque y después</p>del bloque</h2>",
+    "<h2><a href='/n'>Titular normal sin bloques</a></h2><p>Entradilla</p>",
+]
+
+def paginas_sinteticas(n, bloques=1500):
+    rnd = random.Random(42)
+    palabras = ["economía", "mercados", "bolsa", "inflación", "tipos", "banco", "crisis", "empresa", "Ibex", "deuda"]
+    paginas = []
+    for _ in range(n):
+        partes = ['<html><head><meta charset="utf-8"><title>Portada</title>',
+                  "<script>" + "var x = 1;" * 500 + "</script></head><body>"]
+        for i in range(bloques):
+            frase = " ".join(rnd.choice(palabras) for _ in range(rnd.randint(2, 9)))
+            nivel = rnd.choice(("h1", "h2", "h3", "p", "span", "div"))
+            partes.append(
+                f'<div class="card-{i} grid"><a href="/noticia/{i}"><{nivel} class="headline-{i % 7}">'
+                f"{frase}</{nivel}></a><p>{frase} &amp; más texto</p></div>"
+            )
+        partes.append("</body></html>")
+        paginas.append("".join(partes).encode("utf-8"))
+    return paginas
+
+def paginas_cacheadas(n):
+    paginas = []
+    for ruta in sorted(glob.glob(os.path.join(CACHE_DIR, "blobs", "*.gz")))[:n]:
+        with gzip.open(ruta, "rb") as f:
+            paginas.append(f.read())
+    return paginas
+
+def medir(motor, paginas, repeticiones):
+    extraer = MOTORES_ENCABEZADOS[motor]
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for html in paginas:
+            extraer(html)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return len(paginas) / mejor
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--paginas", type=int, default=50)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    paginas = paginas_cacheadas(args.paginas)
+    origen = "caché"
+    if not paginas:
+        paginas = paginas_sinteticas(args.paginas)
+        origen = "sintéticas"
+    mb = sum(len(p) for p in paginas) / 1024 / 1024
+    print(f"{len(paginas)} páginas ({origen}, {mb:.1f} MB)")
+
+    if "lxml" in MOTORES_ENCABEZADOS:
+        bs4, lxml = MOTORES_ENCABEZADOS["bs4"], MOTORES_ENCABEZADOS["lxml"]
+        diferentes = sum(bs4(html) != lxml(html) for html in paginas)
+        print(f"Páginas con salida distinta entre motores: {diferentes}")
+        distintos = [caso for caso in CASOS_LIMITE if bs4(caso) != lxml(caso)]
+        print(f"Casos límite con salida distinta: {len(distintos)} de {len(CASOS_LIMITE)}")
+        for caso in distintos:
+            print(f"  Caso límite distinto: {caso!r}\n    bs4 : {bs4(caso)}\n    lxml: {lxml(caso)}")
+
+    resultados = {motor: medir(motor, paginas, args.repeticiones) for motor in MOTORES_ENCABEZADOS}
+    for motor, pps in resultados.items():
+        print(f"{motor:>5}: {pps:8.1f} páginas/s")
+    if "lxml" in resultados:
+        print(f"Aceleración lxml vs bs4: x{resultados['lxml'] / resultados['bs4']:.1f}")
@@ -0,0 +1,185 @@
+# benchmark_replay.py
+
+"""
+Benchmark offline: reproduce un corpus grabado de snapshots de Wayback por
+noticiero a través de extraer_titulares y de la ruta de subida de main.py,
+usando SQLite en memoria en lugar de Snowflake. No necesita red ni credenciales.
+
+Corpus: <corpus>/<NOMBRE>/<AAAAMMDD>.html.gz (uno por noticiero y día).
+
+Uso:
+    python benchmark_replay.py --grabar --desde 2024-03-01 --dias 5   # graba el corpus (requiere red)
+    python benchmark_replay.py [--motores lxml,bs4]                   # reproduce el corpus
+    python benchmark_replay.py --sintetico 10                         # corpus sintético (sin grabar)
+"""
+
+import argparse
+import contextlib
+import glob
+import gzip
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import main
+import scraper
+from benchmark_parser import paginas_sinteticas
+from config import NOTICIEROS
+
+# resource solo existe en Unix; sin él no se mide la memoria
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CORPUS_DIR = os.getenv("SCRAPER_CORPUS_DIR", "corpus_snapshots")
+
+def grabar_corpus(directorio, desde, dias):
+    """Descarga (o toma de la caché) los snapshots de cada noticiero y los guarda comprimidos."""
+    for medio in NOTICIEROS:
+        carpeta = os.path.join(directorio, medio["nombre"])
+        os.makedirs(carpeta, exist_ok=True)
+        for d in range(dias):
+            fecha_str = (desde + timedelta(days=d)).strftime("%Y%m%d")
+            url = scraper.obtener_snapshot_url_directo(medio["url"], fecha_str)
+            html = scraper.descargar_snapshot(url)
+            with gzip.open(os.path.join(carpeta, f"{fecha_str}.html.gz"), "wb") as f:
+                f.write(html)
+            print(f"[{medio['nombre']}] {fecha_str}: {len(html) / 1024:.0f} KB")
+
+def leer_corpus(directorio):
+    """Devuelve [(medio, fecha_str, html)] para todos los noticieros con páginas grabadas."""
+    paginas = []
+    for medio in NOTICIEROS:
+        for ruta in sorted(glob.glob(os.path.join(directorio, medio["nombre"], "*.html.gz"))):
+            with gzip.open(ruta, "rb") as f:
+                paginas.append((medio, os.path.basename(ruta).split(".")[0], f.read()))
+    return paginas
+
+def corpus_sintetico(paginas_por_medio):
+    htmls = paginas_sinteticas(paginas_por_medio)
+    return [(medio, f"202401{i + 1:02d}", html) for medio in NOTICIEROS for i, html in enumerate(htmls)]
+
+# --8<-- [start:sqlite_standin]
+def subir_a_sqlite(df, config, tabla, ctx):
+    """Sustituto local de subir_a_snowflake: tabla temporal + inserción de claves nuevas."""
+    df = df.copy()
+    df["fecha"] = df["fecha"].astype(str)
+    cols = ["fecha", "titular", "url_archivo", "fuente", "idioma"]
+    ctx.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (fecha TEXT, titular TEXT, url_archivo TEXT, fuente TEXT, idioma TEXT)")
+    ctx.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{tabla} ON {tabla} (fecha, fuente, titular)")
+    ctx.execute("DROP TABLE IF EXISTS tmp_titulares")
+    ctx.execute("CREATE TEMP TABLE tmp_titulares (fecha TEXT, titular TEXT, url_archivo TEXT, fuente TEXT, idioma TEXT)")
+    ctx.executemany("INSERT INTO tmp_titulares VALUES (?, ?, ?, ?, ?)", df[cols].values.tolist())
+    ctx.execute(f"INSERT OR IGNORE INTO {tabla} SELECT * FROM tmp_titulares ORDER BY url_archivo")
+    ctx.commit()
+# --8<-- [end:sqlite_standin]
+
+def reproducir(paginas, motor):
+    """Pasa el corpus por extraer_titulares + subir_resultados y devuelve las métricas."""
+    por_url = {}
+    tareas = []
+    for medio, fecha_str, html in paginas:
+        url = scraper.obtener_snapshot_url_directo(medio["url"], fecha_str)
+        por_url[url] = html
+        tareas.append((medio, fecha_str, url))
+
+    descargar_original, subir_original = scraper.descargar_snapshot, main.subir_a_snowflake
+    scraper.descargar_snapshot = lambda url, **_: por_url[url]
+    main.subir_a_snowflake = subir_a_sqlite
+    ctx = sqlite3.connect(":memory:")
+    por_medio = {}
+    try:
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            t0 = time.perf_counter()
+            for medio, fecha_str, url in tareas:
+                titulares = scraper.extraer_titulares(url, fecha_str, fuente=medio["fuente"], motor=motor)
+                for t in titulares:
+                    t["fuente"] = medio["fuente"]
+                    t["idioma"] = medio["idioma"]
+                por_medio.setdefault(medio["nombre"], (medio, []))[1].extend(titulares)
+            t_extraccion = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for medio, resultados in por_medio.values():
+                main.subir_resultados(medio, resultados, ctx)
+            t_subida = time.perf_counter() - t0
+        filas = sum(ctx.execute(f"SELECT COUNT(*) FROM {m['tabla']}").fetchone()[0] for m, _ in por_medio.values())
+    finally:
+        scraper.descargar_snapshot, main.subir_a_snowflake = descargar_original, subir_original
+        ctx.close()
+
+    titulares_por_medio = {nombre: len(res) for nombre, (_, res) in por_medio.items()}
+    paginas_por_medio = {}
+    for medio, _, _ in tareas:
+        paginas_por_medio[medio["nombre"]] = paginas_por_medio.get(medio["nombre"], 0) + 1
+    return {
+        "paginas": len(tareas),
+        "t_extraccion": t_extraccion,
+        "t_subida": t_subida,
+        "filas": filas,
+        "titulares_por_medio": titulares_por_medio,
+        "paginas_por_medio": paginas_por_medio,
+    }
+
+def rss_pico_bytes():
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+def memoria_pico(corpus_args, motor):
+    """
+    RSS máximo de un proceso nuevo que reproduce el corpus con `motor` (vacío: solo carga el
+    corpus). A diferencia de tracemalloc, incluye la memoria de C de libxml2. None sin `resource`.
+    """
+    if resource is None:
+        return None
+    salida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *corpus_args, "--medir-memoria", motor],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return int(salida.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS_DIR)
+    ap.add_argument("--grabar", action="store_true", help="Graba el corpus en --corpus (requiere red).")
+    ap.add_argument("--desde", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date(), default=datetime(2024, 3, 1).date())
+    ap.add_argument("--dias", type=int, default=5)
+    ap.add_argument("--sintetico", type=int, metavar="N", help="Usa N páginas sintéticas por noticiero.")
+    ap.add_argument("--motores", default=",".join(scraper.MOTORES_ENCABEZADOS))
+    ap.add_argument("--medir-memoria", metavar="MOTOR", help=argparse.SUPPRESS)  # uso interno (subproceso)
+    args = ap.parse_args()
+
+    if args.grabar:
+        grabar_corpus(args.corpus, args.desde, args.dias)
+
+    paginas = corpus_sintetico(args.sintetico) if args.sintetico else leer_corpus(args.corpus)
+    if not paginas:
+        raise SystemExit(f"Corpus vacío en {args.corpus}. Grábalo con --grabar o usa --sintetico N.")
+
+    if args.medir_memoria is not None:
+        if args.medir_memoria:
+            reproducir(paginas, args.medir_memoria)
+        print(rss_pico_bytes())
+        sys.exit(0)
+
+    corpus_args = ["--sintetico", str(args.sintetico)] if args.sintetico else ["--corpus", args.corpus]
+    base = memoria_pico(corpus_args, "")
+    mb = sum(len(h) for _, _, h in paginas) / 1024 / 1024
+    print(f"Corpus: {len(paginas)} páginas, {mb:.1f} MB")
+
+    for motor in args.motores.split(","):
+        r = reproducir(paginas, motor)
+        pico = memoria_pico(corpus_args, motor)
+        print(f"\n=== Motor {motor} ===")
+        print(f"Extracción: {r['paginas'] / r['t_extraccion']:8.1f} páginas/s ({r['t_extraccion']:.2f} s)")
+        print(f"Subida:     {r['filas'] / r['t_subida'] if r['t_subida'] else 0:8.0f} filas/s ({r['filas']} filas en SQLite)")
+        if pico is not None:
+            print(f"RSS pico (proceso nuevo): {pico / 1024 / 1024:.1f} MB "
+                  f"(+{(pico - base) / 1024 / 1024:.1f} MB sobre cargar solo el corpus)")
+        for nombre, n_paginas in r["paginas_por_medio"].items():
+            print(f"  {nombre:<15} {r['titulares_por_medio'].get(nombre, 0) / n_paginas:6.1f} titulares/página")
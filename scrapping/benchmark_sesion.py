@@ -0,0 +1,45 @@
+# benchmark_sesion.py
+
+"""
+Mide la latencia por petición con requests.get sin sesión (handshake TCP+TLS
+en cada llamada) frente a la sesión compartida de scraper.py (keep-alive).
+
+Uso:
+    python benchmark_sesion.py [--url URL] [--peticiones 20]
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from config import CDX_API, WAYBACK_TIMEOUT
+from scraper import SESSION
+
+URL_POR_DEFECTO = f"{CDX_API}?url=bbc.com/news&from=20240101&to=20240101&limit=1&output=json"
+
+def medir(get, url, peticiones):
+    latencias = []
+    for _ in range(peticiones):
+        t0 = time.perf_counter()
+        res = get(url, timeout=WAYBACK_TIMEOUT)
+        res.content  # fuerza la lectura completa del cuerpo
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return latencias
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=URL_POR_DEFECTO)
+    ap.add_argument("--peticiones", type=int, default=20)
+    args = ap.parse_args()
+
+    SESSION.get(args.url, timeout=WAYBACK_TIMEOUT).content  # calienta la conexión del pool
+    sin_sesion = medir(requests.get, args.url, args.peticiones)
+    con_sesion = medir(SESSION.get, args.url, args.peticiones)
+
+    m_sin, m_con = statistics.median(sin_sesion), statistics.median(con_sesion)
+    print(f"URL: {args.url}")
+    print(f"requests.get (sin sesión): mediana {m_sin:7.1f} ms  media {statistics.mean(sin_sesion):7.1f} ms")
+    print(f"SESSION (keep-alive):      mediana {m_con:7.1f} ms  media {statistics.mean(con_sesion):7.1f} ms")
+    print(f"Ahorro por petición:       {m_sin - m_con:7.1f} ms ({(1 - m_con / m_sin) * 100:.0f}%)")
@@ -0,0 +1,108 @@
+# cache_snapshots.py
+
+"""
+Caché local en disco de los snapshots descargados de Wayback Machine.
+
+Los HTML se guardan comprimidos (gzip) y direccionados por contenido: cada
+página se almacena una sola vez bajo el SHA-256 de sus bytes y un índice por
+URL de snapshot apunta a ese blob. Cuando el tamaño total supera el máximo
+configurado se eliminan los blobs usados hace más tiempo.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+
+from config import CACHE_DIR, CACHE_MAX_MB
+
+
+class CacheSnapshots:
+    def __init__(self, directorio=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        self.directorio = directorio
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.dir_blobs = os.path.join(directorio, "blobs")
+        self.dir_urls = os.path.join(directorio, "urls")
+        os.makedirs(self.dir_blobs, exist_ok=True)
+        os.makedirs(self.dir_urls, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(e.stat().st_size for e in os.scandir(self.dir_blobs) if e.name.endswith(".gz"))
+
+    @staticmethod
+    def _hash(datos):
+        return hashlib.sha256(datos).hexdigest()
+
+    def _ruta_url(self, url):
+        return os.path.join(self.dir_urls, self._hash(url.encode("utf-8")))
+
+    def _ruta_blob(self, digest):
+        return os.path.join(self.dir_blobs, f"{digest}.gz")
+
+    @staticmethod
+    def _escribir_atomico(ruta, datos):
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+
+    def obtener(self, url):
+        """Devuelve los bytes cacheados del snapshot o None si no están."""
+        try:
+            with open(self._ruta_url(url), "r") as f:
+                digest = f.read().strip()
+            ruta_blob = self._ruta_blob(digest)
+            with gzip.open(ruta_blob, "rb") as f:
+                contenido = f.read()
+            os.utime(ruta_blob)  # marca de uso para la expulsión LRU
+        except (OSError, EOFError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return contenido
+
+    def guardar(self, url, contenido):
+        digest = self._hash(contenido)
+        ruta_blob = self._ruta_blob(digest)
+        if not os.path.exists(ruta_blob):
+            comprimido = gzip.compress(contenido)
+            self._escribir_atomico(ruta_blob, comprimido)
+            with self._lock:
+                self._total_bytes += len(comprimido)
+        self._escribir_atomico(self._ruta_url(url), digest.encode("ascii"))
+        if self._total_bytes > self.max_bytes:
+            self._expulsar()
+
+    def _expulsar(self):
+        with self._lock:
+            blobs = []
+            total = 0
+            for entrada in os.scandir(self.dir_blobs):
+                if entrada.name.endswith(".gz"):
+                    st = entrada.stat()
+                    blobs.append((st.st_mtime, st.st_size, entrada.path))
+                    total += st.st_size
+            if total <= self.max_bytes:
+                self._total_bytes = total
+                return
+            # Los índices por URL que apunten a un blob expulsado cuentan como miss
+            for _, tamano, ruta in sorted(blobs):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    continue
+                total -= tamano
+                if total <= self.max_bytes:
+                    break
+            self._total_bytes = total
+
+    def resumen(self):
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return f"Caché de snapshots: {self.hits} hits, {self.misses} misses ({ratio:.1f}% aciertos)"
+
+
+cache = CacheSnapshots()
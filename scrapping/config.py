@@ -9,11 +9,65 @@ Ahora las credenciales de Snowflake se leen de variables de entorno
 import os
 
 # Parámetros de ejecución
-SLEEP_BETWEEN_DIAS = 2
+SLEEP_BETWEEN_DIAS = 2   # intervalo inicial entre peticiones a un mismo host (se adapta en ejecución)
 RETRIES = 3
 WAYBACK_TIMEOUT = 30
+CDX_API = "https://web.archive.org/cdx/search/cdx"
 SNAPSHOT_TIMEOUT = 30
 
+# Motor de extracción de encabezados: "lxml" (rápido; vuelve a bs4 en las páginas con bloques
+# dentro de un encabezado, que libxml2 trocea) o "bs4" (BeautifulSoup html.parser)
+PARSER_TITULARES = os.getenv("SCRAPER_PARSER", "lxml")
+
+# Concurrencia del scraping (pares noticiero/día en paralelo)
+MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "8"))
+MAX_POR_HOST = int(os.getenv("SCRAPER_MAX_POR_HOST", "4"))
+
+# Sesión HTTP compartida (keep-alive): hosts distintos en caché y conexiones por host
+POOL_HOSTS = int(os.getenv("SCRAPER_POOL_HOSTS", "10"))
+POOL_POR_HOST = int(os.getenv("SCRAPER_POOL_POR_HOST", str(MAX_POR_HOST)))
+
+# Control adaptativo del ritmo (AIMD por host)
+RITMO_MIN_SEG = float(os.getenv("SCRAPER_RITMO_MIN_SEG", "0.2"))
+RITMO_MAX_SEG = float(os.getenv("SCRAPER_RITMO_MAX_SEG", "60"))
+RITMO_PASO_SEG = float(os.getenv("SCRAPER_RITMO_PASO_SEG", "0.1"))
+BACKOFF_BASE_SEG = float(os.getenv("SCRAPER_BACKOFF_BASE_SEG", "1"))
+
+# Volcado periódico a Snowflake y checkpoint local para reanudar cargas largas
+LOTE_DIAS = int(os.getenv("SCRAPER_LOTE_DIAS", "7"))
+FLUSH_CADA_DIAS = int(os.getenv("SCRAPER_FLUSH_CADA_DIAS", "30"))
+FLUSH_CADA_FILAS = int(os.getenv("SCRAPER_FLUSH_CADA_FILAS", "5000"))
+CHECKPOINT_FILE = os.getenv("SCRAPER_CHECKPOINT_FILE", "checkpoint_titulares.json")
+# Ejecuciones en las que se reintenta un día fallido antes de abandonarlo (queda en el log)
+MAX_INTENTOS_DIA = int(os.getenv("SCRAPER_MAX_INTENTOS_DIA", "3"))
+
+# Índice de primera aparición de titulares (fuente, titular normalizado) en Snowflake.
+# Vacío para desactivarlo y volver a guardar cada repetición diaria.
+TABLA_INDICE_TITULARES = os.getenv("SCRAPER_TABLA_INDICE_TITULARES", "TITULARES_VISTOS")
+# Última fecha de Wayback cargada por tabla: con el índice, un día cuyos titulares ya se
+# habían visto no inserta filas y MAX(fecha) de la tabla se quedaría atrás
+TABLA_MARCAS_TITULARES = os.getenv("SCRAPER_TABLA_MARCAS_TITULARES", "TITULARES_MARCAS")
+
+# Modo en vivo: portadas actuales con GET condicional (ETag / If-Modified-Since)
+ESTADO_EN_VIVO_FILE = os.getenv("SCRAPER_ESTADO_EN_VIVO_FILE", "estado_en_vivo.json")
+EN_VIVO_INTERVALO_MIN = float(os.getenv("SCRAPER_EN_VIVO_INTERVALO_MIN", "60"))
+
+# Archivo permanente del HTML crudo (un fichero comprimido por noticiero y mes).
+# Solo para ejecuciones locales: en GitHub Actions el runner es efímero y se desactiva
+# (SCRAPER_ARCHIVAR_HTML=0 en el workflow)
+ARCHIVAR_HTML = os.getenv("SCRAPER_ARCHIVAR_HTML", "1") == "1"
+ARCHIVO_HTML_DIR = os.getenv("SCRAPER_ARCHIVO_HTML_DIR", "archivo_html")
+REEXTRAER_PROCESOS = int(os.getenv("SCRAPER_REEXTRAER_PROCESOS", str(os.cpu_count() or 1)))
+
+# Log de errores y métricas por etapa (JSON lines + textfile de Prometheus)
+LOG_FILE = os.getenv("SCRAPER_LOG_FILE", "scraping_log.txt")
+METRICAS_JSONL = os.getenv("SCRAPER_METRICAS_JSONL", "metricas_scraping.jsonl")
+METRICAS_PROM = os.getenv("SCRAPER_METRICAS_PROM", "metricas_scraping.prom")
+
+# Caché local de snapshots (HTML comprimido, expulsión por tamaño)
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", ".cache_snapshots")
+CACHE_MAX_MB = float(os.getenv("SCRAPER_CACHE_MAX_MB", "1024"))
+
 # Lista de noticieros
 NOTICIEROS = [
     {
@@ -1,78 +1,451 @@
 from datetime import datetime, timedelta
 import pandas as pd
-import time
+import argparse
+import glob
+import hashlib
+import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    NOTICIEROS, SNOWFLAKE_CONFIG, MAX_WORKERS, MAX_POR_HOST,
+    LOTE_DIAS, FLUSH_CADA_DIAS, FLUSH_CADA_FILAS, CHECKPOINT_FILE, MAX_INTENTOS_DIA, METRICAS_JSONL, METRICAS_PROM,
+    ESTADO_EN_VIVO_FILE, EN_VIVO_INTERVALO_MIN
+)
+from scraper import (
+    obtener_snapshot_url_directo, obtener_capturas_cdx, extraer_titulares, log_error, limite_host,
+    descargar_portada_condicional, parsear_titulares
+)
+from cache_snapshots import cache
+from metricas import metricas
+from snowflake_utils import (
+    FECHA_INICIO_POR_DEFECTO, conectar_snowflake, subir_a_snowflake, obtener_ultimas_fechas_en_snowflake
+)
+
+def procesar_dia(medio, fecha_str, snapshot_url):
+    """Descarga el snapshot de un noticiero para un día y devuelve sus titulares (None si falla)."""
+    fuente = medio["fuente"]
+    print(f"[{fuente}] Procesando {fecha_str}...")
+    print(f"Snapshot for {fecha_str}: {snapshot_url}")
+
+    try:
+        # El límite por host reparte las conexiones a web.archive.org entre los hilos
+        # El ritmo entre peticiones lo regula el controlador adaptativo de scraper.py
+        with limite_host(snapshot_url):
+            titulares = extraer_titulares(snapshot_url, fecha_str, fuente=fuente, relanzar=True)
+        for t in titulares:
+            t["fuente"] = fuente
+            t["idioma"] = medio["idioma"]
+        if titulares:
+            print(f"[{fuente}] {len(titulares)} titulares encontrados en {fecha_str}.")
+        else:
+            print(f"[{fuente}] Snapshot sin titulares en {fecha_str}.")
+        return titulares
+    except Exception as e:
+        log_error(f"[{fuente}] Error en {fecha_str}: {e}")
+        print(f"[{fuente}] Error en {fecha_str}: {e}")
+        return None
+
+# Clave del checkpoint con los días fallidos pendientes: {tabla: {YYYYMMDD: intentos}}
+CLAVE_FALLIDOS = "_dias_fallidos"
 
-from config import NOTICIEROS, SNOWFLAKE_CONFIG, RETRIES, SLEEP_BETWEEN_DIAS
-from scraper import obtener_snapshot_url_directo, extraer_titulares, log_error
-from snowflake_utils import subir_a_snowflake, obtener_ultima_fecha_en_snowflake
+def leer_checkpoint(ruta=CHECKPOINT_FILE):
+    """Devuelve {tabla: último día procesado (YYYYMMDD)} y, en CLAVE_FALLIDOS, los días a reintentar."""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-# Mostrar config básica (sin password) para depuración
-print("=== CONFIG SCRAPER ===")
-print(f"Account:   {SNOWFLAKE_CONFIG.get('account')}")
-print(f"Database:  {SNOWFLAKE_CONFIG.get('database')}")
-print(f"Schema:    {SNOWFLAKE_CONFIG.get('schema')}  (esperado desde SNOWFLAKE_SCHEMA1)")
-print(f"Warehouse: {SNOWFLAKE_CONFIG.get('warehouse')}")
-print("=======================")
+def guardar_checkpoint(checkpoint, ruta=CHECKPOINT_FILE):
+    # Escritura atómica: un corte a mitad de escritura no corrompe el checkpoint
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(tmp, ruta)
 
-if not SNOWFLAKE_CONFIG.get('schema'):
-    print("[ERROR] El schema está vacío. Asegúrate de definir el secret SNOWFLAKE_SCHEMA1.", file=sys.stderr)
-    sys.exit(1)
+def aplicar_checkpoint(rangos, checkpoint):
+    # Reanuda tras el último día procesado aunque ese día no tuviera titulares. Solo avanza:
+    # un checkpoint local más antiguo que la marca de Snowflake no rebobina la tabla
+    # (los días fallidos se reintentan aparte, con dias_a_reintentar)
+    rangos = dict(rangos)
+    for tabla, ultimo in checkpoint.items():
+        if tabla != CLAVE_FALLIDOS and tabla in rangos:
+            inicio, fin = rangos[tabla]
+            siguiente = datetime.strptime(ultimo, "%Y%m%d").date() + timedelta(days=1)
+            if siguiente > inicio:
+                print(f"Checkpoint local para {tabla}: reanudando desde {siguiente}")
+                rangos[tabla] = (siguiente, fin)
+    return rangos
+
+def dias_a_reintentar(checkpoint, rangos):
+    """{tabla: [YYYYMMDD]} de los días fallidos pendientes que no caen ya dentro del rango a recorrer."""
+    reintentos = {}
+    for tabla, fallidos in checkpoint.get(CLAVE_FALLIDOS, {}).items():
+        inicio = rangos[tabla][0].strftime("%Y%m%d") if tabla in rangos else None
+        dias = sorted(d for d in fallidos if inicio is None or d < inicio)
+        if dias:
+            print(f"Reintentando {len(dias)} días fallidos de {tabla}: {', '.join(dias)}")
+            reintentos[tabla] = dias
+    return reintentos
+
+def rangos_shard(fecha_inicio, fecha_fin, indice, total):
+    """
+    Reparte el espacio (noticiero, día) en `total` bloques contiguos y devuelve
+    {tabla: (inicio, fin)} del bloque `indice` (base 0). Cada noticiero queda como
+    mucho en un rango continuo por shard, así la consulta CDX sigue siendo una.
+    """
+    dias = (fecha_fin - fecha_inicio).days + 1
+    pares = [(medio["tabla"], d) for medio in NOTICIEROS for d in range(max(dias, 0))]
+    desde = len(pares) * indice // total
+    hasta = len(pares) * (indice + 1) // total
+    rangos = {}
+    for tabla, d in pares[desde:hasta]:
+        fecha = fecha_inicio + timedelta(days=d)
+        inicio, _ = rangos.get(tabla, (fecha, fecha))
+        rangos[tabla] = (inicio, fecha)
+    return rangos
 
 # --8<-- [start:configfechas-noticieros]
-for medio in NOTICIEROS:
-    nombre = medio["nombre"]
-    url = medio["url"]
-    fuente = medio["fuente"]
-    idioma = medio["idioma"]
-    tabla = medio["tabla"]
+def planificar_tareas(rangos, reintentos=None):
+    """
+    Devuelve la lista de (medio, fecha_str, snapshot_url, fecha_referencia) a procesar
+    para los rangos {tabla: (inicio, fin)} y los días sueltos {tabla: [YYYYMMDD]} de
+    `reintentos`. fecha_referencia indica el día cuyos titulares se reutilizan
+    (página idéntica) o None.
+    """
+    tareas = []
+    for medio in NOTICIEROS:
+        nombre = medio["nombre"]
+        url = medio["url"]
+        fuente = medio["fuente"]
+        tabla = medio["tabla"]
+        for fecha_str in (reintentos or {}).get(tabla, []):
+            tareas.append((medio, fecha_str, obtener_snapshot_url_directo(url, fecha_str), None))
+        if tabla not in rangos:
+            continue
 
-    print(f"\nProcesando noticiero: {nombre} ({fuente})")
+        print(f"\nProcesando noticiero: {nombre} ({fuente})")
 
-    FECHA_INICIO = obtener_ultima_fecha_en_snowflake(SNOWFLAKE_CONFIG, tabla)
-    FECHA_FIN = datetime.today().date() - timedelta(days=1)
+        FECHA_INICIO, fecha_fin = rangos[tabla]
+        fecha_fin_dt = datetime.combine(fecha_fin, datetime.min.time())
 
-    print(f"Fecha de inicio: {FECHA_INICIO}")
-    print(f"Fecha de fin:    {FECHA_FIN}")
+        print(f"Fecha de inicio: {FECHA_INICIO}")
+        print(f"Fecha de fin:    {fecha_fin}")
 
-    fecha = datetime.combine(FECHA_INICIO, datetime.min.time())
-    fecha_fin_dt = datetime.combine(FECHA_FIN, datetime.min.time())
+        fecha = datetime.combine(FECHA_INICIO, datetime.min.time())
+        if fecha > fecha_fin_dt:
+            continue
+
+        # Una sola consulta CDX por noticiero para todo el rango; si falla, URL directa por día
+        capturas = obtener_capturas_cdx(url, fecha.strftime("%Y%m%d"), fecha_fin.strftime("%Y%m%d")) or {}
+        digest_anterior, fecha_referencia = None, None
+        while fecha <= fecha_fin_dt:
+            fecha_str = fecha.strftime("%Y%m%d")
+            captura = capturas.get(fecha_str)
+            if captura is None:
+                tareas.append((medio, fecha_str, obtener_snapshot_url_directo(url, fecha_str), None))
+                digest_anterior, fecha_referencia = None, None
+            elif captura["digest"] == digest_anterior:
+                # Página idéntica byte a byte a la del día anterior: se reutilizan sus titulares
+                tareas.append((medio, fecha_str, captura["url"], fecha_referencia))
+            else:
+                tareas.append((medio, fecha_str, captura["url"], None))
+                digest_anterior, fecha_referencia = captura["digest"], fecha_str
+            fecha += timedelta(days=1)
+    return tareas
 # --8<-- [end:configfechas-noticieros]
 
-    resultados = []
 # --8<-- [start:extraer-titulares]
-    while fecha <= fecha_fin_dt:
-        fecha_str = fecha.strftime("%Y%m%d")
-        print(f"[{fuente}] Procesando {fecha_str}...")
-
-        snapshot_url = obtener_snapshot_url_directo(url, fecha_str)
-        print(f"Snapshot for {fecha_str}: {snapshot_url}")
+def descargar_titulares(tareas, titulares_por_dia=None):
+    """
+    Ejecuta las tareas en paralelo y devuelve {(nombre, fecha_str): titulares}.
+    titulares_por_dia permite resolver días de referencia descargados en un lote anterior.
+    """
+    pendientes = [t for t in tareas if t[3] is None]
+    print(f"\nDescargando {len(pendientes)} snapshots ({len(tareas) - len(pendientes)} días sin cambios) "
+          f"con {MAX_WORKERS} hilos (máx. {MAX_POR_HOST} por host)...")
+    titulares_por_dia = {} if titulares_por_dia is None else titulares_por_dia
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        futuros = {
+            ex.submit(procesar_dia, medio, fecha_str, snapshot_url): (medio["nombre"], fecha_str)
+            for medio, fecha_str, snapshot_url, _ in pendientes
+        }
+        for fut in as_completed(futuros):
+            titulares_por_dia[futuros[fut]] = fut.result()
 
-        try:
-            titulares = extraer_titulares(snapshot_url, fecha_str, fuente=fuente)
-            for t in titulares:
-                t["fuente"] = fuente
-                t["idioma"] = idioma
-            if titulares:
-                print(f"{len(titulares)} titulares encontrados.")
-            else:
-                print("Snapshot sin titulares.")
-            resultados.extend(titulares)
-        except Exception as e:
-            log_error(f"[{fuente}] Error en {fecha_str}: {e}")
-            print(f"[{fuente}] Error en {fecha_str}: {e}")
-
-        time.sleep(SLEEP_BETWEEN_DIAS)
-        fecha += timedelta(days=1)
+    for medio, fecha_str, snapshot_url, fecha_referencia in tareas:
+        if fecha_referencia is not None:
+            # Si falló el día de referencia, el día que lo reutiliza también cuenta como fallido
+            referencia = titulares_por_dia[(medio["nombre"], fecha_referencia)]
+            titulares_por_dia[(medio["nombre"], fecha_str)] = None if referencia is None else [
+                dict(t, fecha=fecha_str, url_archivo=snapshot_url) for t in referencia
+            ]
+    return titulares_por_dia
 # --8<-- [end:extraer-titulares]
 
 # --8<-- [start:subida-snowflake]
+def subir_resultados(medio, resultados, ctx):
+    fuente = medio["fuente"]
+    tabla = medio["tabla"]
     if resultados:
         df_nuevo = pd.DataFrame(resultados)
         df_nuevo.drop_duplicates(subset=["fecha", "titular"], inplace=True)
         print(f"Subiendo {len(df_nuevo)} filas a {SNOWFLAKE_CONFIG['database']}.{SNOWFLAKE_CONFIG['schema']}.{tabla} ...")
-        subir_a_snowflake(df_nuevo, SNOWFLAKE_CONFIG, tabla)
+        with metricas.cronometro("upload", fuente):
+            subir_a_snowflake(df_nuevo, SNOWFLAKE_CONFIG, tabla, ctx)
+        metricas.sumar("filas_subidas", len(df_nuevo), fuente)
         print(f"Total titulares subidos para {fuente}: {len(df_nuevo)}")
     else:
         print(f"No se encontraron titulares nuevos para {fuente}.")
 # --8<-- [end:subida-snowflake]
+
+def registrar_fallidos(medio, dias, titulares_por_dia, checkpoint):
+    """Actualiza los intentos de los días fallidos y abandona los que llegan a MAX_INTENTOS_DIA."""
+    fuente, tabla = medio["fuente"], medio["tabla"]
+    pendientes = checkpoint.setdefault(CLAVE_FALLIDOS, {}).setdefault(tabla, {})
+    for d in dias:
+        if titulares_por_dia[(medio["nombre"], d)] is not None:
+            pendientes.pop(d, None)
+            continue
+        intentos = pendientes.get(d, 0) + 1
+        if intentos >= MAX_INTENTOS_DIA:
+            pendientes.pop(d, None)
+            log_error(f"[{fuente}] Se abandona {d} tras {intentos} intentos fallidos.")
+            print(f"[{fuente}] Se abandona {d} tras {intentos} intentos fallidos.")
+        else:
+            pendientes[d] = intentos
+            print(f"[{fuente}] {d} falló (intento {intentos} de {MAX_INTENTOS_DIA}); se reintentará.")
+    if not pendientes:
+        del checkpoint[CLAVE_FALLIDOS][tabla]
+
+def procesar_en_lotes(tareas, checkpoint, subir, ruta_checkpoint=CHECKPOINT_FILE):
+    """
+    Descarga por ventanas de LOTE_DIAS días y vuelca cada noticiero con subir(medio, resultados)
+    cada FLUSH_CADA_DIAS días o FLUSH_CADA_FILAS filas, actualizando el checkpoint tras cada volcado.
+    Los días fallidos quedan en el checkpoint para reintentarlos hasta MAX_INTENTOS_DIA ejecuciones.
+    """
+    fechas = sorted({fecha_str for _, fecha_str, _, _ in tareas})
+    ultima_fecha = {}
+    for medio, fecha_str, _, _ in tareas:
+        ultima_fecha[medio["nombre"]] = max(fecha_str, ultima_fecha.get(medio["nombre"], fecha_str))
+
+    titulares_por_dia = {}
+    dias_pendientes = {medio["nombre"]: [] for medio in NOTICIEROS}
+    for i in range(0, len(fechas), LOTE_DIAS):
+        ventana = set(fechas[i:i + LOTE_DIAS])
+        lote = [t for t in tareas if t[1] in ventana]
+        fin_ventana = max(ventana)
+        descargar_titulares(lote, titulares_por_dia)
+        for medio, fecha_str, _, _ in lote:
+            dias_pendientes[medio["nombre"]].append(fecha_str)
+
+        # Días que lotes posteriores reutilizan (páginas idénticas) y no se pueden descartar aún
+        referencias = {(m["nombre"], ref) for m, f, _, ref in tareas if ref is not None and f > fin_ventana}
+
+        for medio in NOTICIEROS:
+            nombre = medio["nombre"]
+            dias = sorted(dias_pendientes[nombre])
+            if not dias:
+                continue
+            filas = sum(len(titulares_por_dia[(nombre, d)] or []) for d in dias)
+            if len(dias) < FLUSH_CADA_DIAS and filas < FLUSH_CADA_FILAS and dias[-1] != ultima_fecha[nombre]:
+                continue
+
+            # Se mantiene el orden cronológico del recorrido secuencial
+            resultados = [t for d in dias for t in titulares_por_dia[(nombre, d)] or []]
+            subir(medio, resultados)
+            registrar_fallidos(medio, dias, titulares_por_dia, checkpoint)
+            checkpoint[medio["tabla"]] = max(dias[-1], checkpoint.get(medio["tabla"], dias[-1]))
+            guardar_checkpoint(checkpoint, ruta_checkpoint)
+            dias_pendientes[nombre] = []
+            for clave in [k for k in titulares_por_dia if k[0] == nombre and k not in referencias]:
+                del titulares_por_dia[clave]
+
+# --8<-- [start:shards]
+def escritor_shard(directorio, etiqueta):
+    """Devuelve una función subir(medio, resultados) que guarda cada volcado en Parquet."""
+    def subir(medio, resultados):
+        if not resultados:
+            print(f"No se encontraron titulares nuevos para {medio['fuente']}.")
+            return
+        df = pd.DataFrame(resultados).drop_duplicates(subset=["fecha", "titular"])
+        carpeta = os.path.join(directorio, medio["tabla"])
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"{etiqueta}_{df['fecha'].min()}_{df['fecha'].max()}.parquet")
+        df.to_parquet(ruta, index=False)
+        print(f"[{etiqueta}] {len(df)} titulares de {medio['fuente']} guardados en {ruta}")
+    return subir
+
+def fusionar_shards(directorio, ctx):
+    """Carga en Snowflake las salidas de todos los shards, sin duplicados (MERGE por clave)."""
+    for medio in NOTICIEROS:
+        carpeta = os.path.join(directorio, medio["tabla"])
+        partes = sorted(glob.glob(os.path.join(carpeta, "*.parquet")))
+        if not partes:
+            print(f"Sin salidas de shards para {medio['fuente']}.")
+            continue
+        df = pd.concat([pd.read_parquet(p) for p in partes], ignore_index=True).sort_values("fecha", kind="stable")
+        subir_resultados(medio, df.to_dict("records"), ctx)
+# --8<-- [end:shards]
+
+# --8<-- [start:en-vivo]
+def _huella_titular(titular):
+    return hashlib.sha1(" ".join(titular.lower().split()).encode("utf-8")).hexdigest()[:16]
+
+def sondear_portada(medio, estado, fecha_str):
+    """
+    Descarga la portada actual de un noticiero con GET condicional y devuelve solo
+    los titulares no vistos antes en el día. `estado` es el estado en vivo del medio.
+    """
+    fuente = medio["fuente"]
+    url = medio["url"]
+    if estado.get("fecha") != fecha_str:
+        estado["fecha"] = fecha_str
+        estado["vistos"] = []
+    try:
+        with limite_host(url):
+            with metricas.cronometro("fetch", fuente):
+                html = descargar_portada_condicional(url, estado, fuente=fuente)
+        if html is None:
+            print(f"[{fuente}] Portada sin cambios.")
+            return []
+        with metricas.cronometro("parse", fuente):
+            titulares = parsear_titulares(html, url, fecha_str, fuente=fuente)
+    except Exception as e:
+        # Sin huella ni cabeceras condicionales, la próxima pasada vuelve a descargar
+        # y procesar la página completa (si no, un 304 la daría por procesada)
+        estado["hash"] = estado["etag"] = estado["last_modified"] = None
+        log_error(f"[{fuente}] Error en portada en vivo: {e}")
+        print(f"[{fuente}] Error en portada en vivo: {e}")
+        return []
+
+    vistos = set(estado["vistos"])
+    nuevos = []
+    for t in titulares:
+        huella = _huella_titular(t["titular"])
+        if huella in vistos:
+            continue
+        vistos.add(huella)
+        estado["vistos"].append(huella)
+        t["fuente"] = fuente
+        t["idioma"] = medio["idioma"]
+        nuevos.append(t)
+    metricas.sumar("titulares", len(nuevos), fuente)
+    print(f"[{fuente}] {len(nuevos)} titulares nuevos de {len(titulares)} en portada.")
+    return nuevos
+
+def sondear_en_vivo(subir, ruta_estado=ESTADO_EN_VIVO_FILE):
+    """Una pasada por todas las portadas; el estado solo se guarda tras subir los titulares nuevos."""
+    estado = leer_checkpoint(ruta_estado)
+    fecha_str = datetime.today().strftime("%Y%m%d")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        futuros = {
+            medio["nombre"]: ex.submit(sondear_portada, medio, estado.setdefault(medio["nombre"], {}), fecha_str)
+            for medio in NOTICIEROS
+        }
+    for medio in NOTICIEROS:
+        nuevos = futuros[medio["nombre"]].result()
+        if nuevos:
+            subir(medio, nuevos)
+    guardar_checkpoint(estado, ruta_estado)
+# --8<-- [end:en-vivo]
+
+def _parsear_shard(valor):
+    try:
+        i, n = (int(x) for x in valor.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("El formato de --shard es i/n, p. ej. 0/4")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError("--shard i/n requiere 0 <= i < n")
+    return i, n
+
+def _parsear_fecha(valor):
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+def cerrar_ejecucion():
+    print(f"\n{cache.resumen()}")
+    metricas.escribir_jsonl()
+    metricas.escribir_prometheus(extra={"cache_hits": cache.hits, "cache_misses": cache.misses})
+    print(f"Métricas guardadas en {METRICAS_JSONL} y {METRICAS_PROM}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scraping diario de titulares (Wayback Machine → Snowflake).")
+    ap.add_argument("--shard", type=_parsear_shard, metavar="i/n",
+                    help="Backfill por shards: procesa el bloque i (base 0) de n y guarda la salida en --salida, sin subir a Snowflake.")
+    ap.add_argument("--desde", type=_parsear_fecha, default=FECHA_INICIO_POR_DEFECTO, metavar="AAAA-MM-DD",
+                    help="Inicio del backfill por shards (por defecto 2024-01-01).")
+    ap.add_argument("--hasta", type=_parsear_fecha, metavar="AAAA-MM-DD",
+                    help="Fin del backfill por shards (por defecto ayer).")
+    ap.add_argument("--salida", default="shards_titulares",
+                    help="Directorio de salida de los shards (y de entrada de --fusionar).")
+    ap.add_argument("--fusionar", action="store_true",
+                    help="Carga en Snowflake las salidas de todos los shards de --salida sin duplicados.")
+    ap.add_argument("--en-vivo", action="store_true",
+                    help="Sondea las portadas actuales (GET condicional) y sube solo los titulares nuevos del día.")
+    ap.add_argument("--repetir", action="store_true",
+                    help="Con --en-vivo, repite el sondeo cada --intervalo minutos hasta interrumpirlo.")
+    ap.add_argument("--intervalo", type=float, default=EN_VIVO_INTERVALO_MIN, metavar="MIN",
+                    help="Minutos entre sondeos en vivo con --repetir.")
+    args = ap.parse_args()
+
+    FECHA_FIN = datetime.today().date() - timedelta(days=1)
+
+    if args.shard:
+        # Los shards no tocan Snowflake: el rango es fijo para que todos planifiquen lo mismo
+        i, n = args.shard
+        etiqueta = f"shard{i}de{n}"
+        rangos = rangos_shard(args.desde, args.hasta or FECHA_FIN, i, n)
+        ruta_checkpoint = os.path.join(args.salida, f"checkpoint_{etiqueta}.json")
+        os.makedirs(args.salida, exist_ok=True)
+        checkpoint = leer_checkpoint(ruta_checkpoint)
+        rangos = aplicar_checkpoint(rangos, checkpoint)
+
+        tareas = planificar_tareas(rangos, dias_a_reintentar(checkpoint, rangos))
+        try:
+            procesar_en_lotes(tareas, checkpoint, escritor_shard(args.salida, etiqueta), ruta_checkpoint)
+        finally:
+            cerrar_ejecucion()
+        sys.exit(0)
+
+    # Mostrar config básica (sin password) para depuración
+    print("=== CONFIG SCRAPER ===")
+    print(f"Account:   {SNOWFLAKE_CONFIG.get('account')}")
+    print(f"Database:  {SNOWFLAKE_CONFIG.get('database')}")
+    print(f"Schema:    {SNOWFLAKE_CONFIG.get('schema')}  (esperado desde SNOWFLAKE_SCHEMA1)")
+    print(f"Warehouse: {SNOWFLAKE_CONFIG.get('warehouse')}")
+    print("=======================")
+
+    if not SNOWFLAKE_CONFIG.get('schema'):
+        print("[ERROR] El schema está vacío. Asegúrate de definir el secret SNOWFLAKE_SCHEMA1.", file=sys.stderr)
+        sys.exit(1)
+
+    # Una única conexión a Snowflake reutilizada durante toda la ejecución
+    ctx = conectar_snowflake(SNOWFLAKE_CONFIG)
+    try:
+        if args.fusionar:
+            fusionar_shards(args.salida, ctx)
+            sys.exit(0)
+
+        if args.en_vivo:
+            subir = lambda medio, resultados: subir_resultados(medio, resultados, ctx)
+            sondear_en_vivo(subir)
+            while args.repetir:
+                time.sleep(args.intervalo * 60)
+                sondear_en_vivo(subir)
+            sys.exit(0)
+
+        # Una sola consulta (UNION ALL) con la última fecha cargada de todas las tablas
+        fechas_inicio = obtener_ultimas_fechas_en_snowflake(SNOWFLAKE_CONFIG, [m["tabla"] for m in NOTICIEROS], ctx)
+        rangos = {tabla: (inicio, FECHA_FIN) for tabla, inicio in fechas_inicio.items()}
+
+        checkpoint = leer_checkpoint()
+        rangos = aplicar_checkpoint(rangos, checkpoint)
+
+        tareas = planificar_tareas(rangos, dias_a_reintentar(checkpoint, rangos))
+        procesar_en_lotes(tareas, checkpoint, lambda medio, resultados: subir_resultados(medio, resultados, ctx))
+    finally:
+        ctx.close()
+        cerrar_ejecucion()
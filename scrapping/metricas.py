@@ -0,0 +1,120 @@
+# metricas.py
+
+"""
+Instrumentación por etapas del scraping de titulares.
+
+Acumula en memoria (de forma segura entre hilos) histogramas de latencia por
+etapa y noticiero (fetch, parse, upload), contadores (bytes descargados,
+aciertos de caché, encabezados, titulares, filas subidas) y un registro por
+noticiero/día. Fetch y bytes descargados solo cuentan peticiones a la red. Al
+final de cada ejecución se escriben:
+
+- un fichero JSON lines (se añade al final, una línea por día y un resumen),
+- un textfile de Prometheus (se sobrescribe, formato node_exporter).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import METRICAS_JSONL, METRICAS_PROM
+
+# Límites superiores (segundos) de los buckets de latencia
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metricas:
+    def __init__(self):
+        self.inicio = time.time()
+        self.id_ejecucion = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (etapa, fuente) -> [cuentas por bucket, suma, total]
+        self._contadores = {}   # (nombre, fuente) -> valor
+        self._dias = {}         # (fuente, fecha_str) -> campos
+
+    def observar(self, etapa, fuente, segundos):
+        with self._lock:
+            h = self._histogramas.setdefault((etapa, fuente or "GENERAL"), [[0] * len(BUCKETS), 0.0, 0])
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    h[0][i] += 1
+            h[1] += segundos
+            h[2] += 1
+
+    @contextmanager
+    def cronometro(self, etapa, fuente=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, fuente, time.perf_counter() - t0)
+
+    def sumar(self, nombre, valor, fuente=None):
+        with self._lock:
+            clave = (nombre, fuente or "GENERAL")
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def registrar_dia(self, fuente, fecha_str, **campos):
+        with self._lock:
+            self._dias.setdefault((fuente or "GENERAL", fecha_str), {}).update(campos)
+
+    def _resumen_etapas(self):
+        return {
+            f"{etapa}/{fuente}": {"total": total, "suma_s": round(suma, 4), "media_s": round(suma / total, 4) if total else None}
+            for (etapa, fuente), (_, suma, total) in sorted(self._histogramas.items())
+        }
+
+    def escribir_jsonl(self, ruta=METRICAS_JSONL):
+        with self._lock:
+            with open(ruta, "a", encoding="utf-8") as f:
+                for (fuente, fecha_str), campos in sorted(self._dias.items()):
+                    f.write(json.dumps({"tipo": "dia", "ejecucion": self.id_ejecucion, "fuente": fuente,
+                                        "fecha": fecha_str, **campos}, ensure_ascii=False) + "\n")
+                f.write(json.dumps({
+                    "tipo": "resumen",
+                    "ejecucion": self.id_ejecucion,
+                    "duracion_s": round(time.time() - self.inicio, 3),
+                    "etapas": self._resumen_etapas(),
+                    "contadores": {f"{n}/{fu}": v for (n, fu), v in sorted(self._contadores.items())},
+                }, ensure_ascii=False) + "\n")
+
+    def escribir_prometheus(self, ruta=METRICAS_PROM, extra=None):
+        lineas = [
+            "# HELP scraper_etapa_segundos Latencia por etapa y noticiero.",
+            "# TYPE scraper_etapa_segundos histogram",
+        ]
+        with self._lock:
+            for (etapa, fuente), (cuentas, suma, total) in sorted(self._histogramas.items()):
+                etiquetas = f'etapa="{etapa}",fuente="{fuente}"'
+                for limite, cuenta in zip(BUCKETS, cuentas):
+                    lineas.append(f'scraper_etapa_segundos_bucket{{{etiquetas},le="{limite}"}} {cuenta}')
+                lineas.append(f'scraper_etapa_segundos_bucket{{{etiquetas},le="+Inf"}} {total}')
+                lineas.append(f"scraper_etapa_segundos_sum{{{etiquetas}}} {suma:.6f}")
+                lineas.append(f"scraper_etapa_segundos_count{{{etiquetas}}} {total}")
+
+            nombres = sorted({n for n, _ in self._contadores})
+            for nombre in nombres:
+                lineas.append(f"# TYPE scraper_{nombre}_total counter")
+                for (n, fuente), valor in sorted(self._contadores.items()):
+                    if n == nombre:
+                        lineas.append(f'scraper_{nombre}_total{{fuente="{fuente}"}} {valor}')
+
+        for nombre, valor in (extra or {}).items():
+            lineas.append(f"# TYPE scraper_{nombre} gauge")
+            lineas.append(f"scraper_{nombre} {valor}")
+        lineas.append("# TYPE scraper_duracion_ejecucion_segundos gauge")
+        lineas.append(f"scraper_duracion_ejecucion_segundos {time.time() - self.inicio:.3f}")
+        lineas.append("# TYPE scraper_ultima_ejecucion_timestamp_segundos gauge")
+        lineas.append(f"scraper_ultima_ejecucion_timestamp_segundos {time.time():.0f}")
+
+        # Escritura atómica para que el textfile collector nunca lea un fichero a medias
+        tmp = f"{ruta}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n")
+        os.replace(tmp, ruta)
+
+
+metricas = Metricas()
@@ -0,0 +1,82 @@
+# reextraer.py
+
+"""
+Re-extracción de titulares desde el archivo de HTML crudo (archivo_html.py).
+
+Pasa la versión actual de parsear_titulares por todos los ficheros mensuales
+seleccionados usando todos los núcleos (un proceso por fichero) y reemplaza en
+Snowflake, día a día y en una transacción por tabla, las filas afectadas.
+
+Uso:
+    python reextraer.py [--fuentes BBC,EXPANSION] [--desde 202401] [--hasta 202406]
+                        [--procesos N] [--motor lxml] [--sin-subir]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from config import NOTICIEROS, SNOWFLAKE_CONFIG, ARCHIVO_HTML_DIR, REEXTRAER_PROCESOS, PARSER_TITULARES
+from archivo_html import leer_archivo, listar_archivos
+from snowflake_utils import conectar_snowflake, reemplazar_dias_en_snowflake
+
+MEDIO_POR_CARPETA = {m["fuente"].replace(" ", "_"): m for m in NOTICIEROS}
+
+def reextraer_archivo(carpeta, ruta, motor):
+    """Devuelve (carpeta, {fecha_str: titulares}) de un fichero mensual; gana la última captura del día."""
+    # Import local: cada proceso hijo carga su propio parser
+    import contextlib
+    from scraper import parsear_titulares
+
+    medio = MEDIO_POR_CARPETA[carpeta]
+    por_dia = {}
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for fecha_str, url, html in leer_archivo(ruta):
+            titulares = parsear_titulares(html, url, fecha_str, fuente=medio["fuente"], motor=motor)
+            for t in titulares:
+                t["fuente"] = medio["fuente"]
+                t["idioma"] = medio["idioma"]
+            por_dia[fecha_str] = titulares
+    return carpeta, por_dia
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--directorio", default=ARCHIVO_HTML_DIR)
+    ap.add_argument("--fuentes", help="Noticieros separados por comas (p. ej. BBC,EL_PAIS). Por defecto, todos.")
+    ap.add_argument("--desde", metavar="AAAAMM")
+    ap.add_argument("--hasta", metavar="AAAAMM")
+    ap.add_argument("--procesos", type=int, default=REEXTRAER_PROCESOS)
+    ap.add_argument("--motor", default=PARSER_TITULARES)
+    ap.add_argument("--sin-subir", action="store_true", help="Solo muestra el resultado, sin tocar Snowflake.")
+    args = ap.parse_args()
+
+    fuentes = args.fuentes.split(",") if args.fuentes else None
+    archivos = [a for a in listar_archivos(args.directorio, fuentes, args.desde, args.hasta) if a[0] in MEDIO_POR_CARPETA]
+    if not archivos:
+        print(f"No hay ficheros archivados en {args.directorio} para la selección indicada.")
+        sys.exit(0)
+    print(f"Re-extrayendo {len(archivos)} ficheros con {args.procesos} procesos (motor {args.motor})...")
+
+    por_medio = {}
+    with ProcessPoolExecutor(max_workers=args.procesos) as ex:
+        futuros = [ex.submit(reextraer_archivo, carpeta, ruta, args.motor) for carpeta, _, ruta in archivos]
+        for fut in futuros:
+            carpeta, por_dia = fut.result()
+            por_medio.setdefault(carpeta, {}).update(por_dia)
+
+    ctx = None if args.sin_subir else conectar_snowflake(SNOWFLAKE_CONFIG)
+    try:
+        for carpeta, por_dia in por_medio.items():
+            medio = MEDIO_POR_CARPETA[carpeta]
+            filas = [t for fecha_str in sorted(por_dia) for t in por_dia[fecha_str]]
+            df = pd.DataFrame(filas, columns=["fecha", "titular", "url_archivo", "fuente", "idioma"])
+            df = df.drop_duplicates(subset=["fecha", "titular"])
+            print(f"[{medio['fuente']}] {len(por_dia)} días, {len(df)} titulares")
+            if ctx is not None:
+                reemplazar_dias_en_snowflake(df, por_dia.keys(), SNOWFLAKE_CONFIG, medio["tabla"], ctx, fuente=medio["fuente"])
+    finally:
+        if ctx is not None:
+            ctx.close()
@@ -1,15 +1,164 @@
 # scraper.py
 
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, UnicodeDammit
 from datetime import datetime
-from config import WAYBACK_TIMEOUT, SNAPSHOT_TIMEOUT
+from config import (
+    WAYBACK_TIMEOUT, SNAPSHOT_TIMEOUT, MAX_POR_HOST, CDX_API, PARSER_TITULARES,
+    SLEEP_BETWEEN_DIAS, RETRIES, RITMO_MIN_SEG, RITMO_MAX_SEG, RITMO_PASO_SEG, BACKOFF_BASE_SEG,
+    POOL_HOSTS, POOL_POR_HOST, LOG_FILE, ARCHIVAR_HTML
+)
+from cache_snapshots import cache
+from metricas import metricas
+from archivo_html import archivar_html
+
+# lxml opcional: si no está instalado se usa BeautifulSoup (html.parser)
+try:
+    from lxml import etree
+except Exception:
+    etree = None
+
+# brotli opcional: solo se anuncia "br" si urllib3 puede descomprimirlo
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except Exception:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# ============ Sesión HTTP compartida ============
+# Conexiones keep-alive reutilizadas por todos los hilos: evita un handshake TCP+TLS
+# por snapshot. Los reintentos los gestiona peticion_con_reintentos, no el adapter.
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_POR_HOST, max_retries=0, pool_block=False)
+SESSION.mount("https://", adapter)
+SESSION.mount("http://", adapter)
+
+# Semáforos por host para limitar las peticiones simultáneas a un mismo servidor
+_semaforos_host = {}
+_lock_semaforos = threading.Lock()
+
+@contextmanager
+def limite_host(url, max_por_host=MAX_POR_HOST):
+    host = urlparse(url).netloc.lower()
+    with _lock_semaforos:
+        sem = _semaforos_host.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(max_por_host)
+            _semaforos_host[host] = sem
+    with sem:
+        yield
+
+# --8<-- [start:control_ritmo]
+class ControladorRitmo:
+    """
+    Control AIMD del intervalo entre peticiones a un host: cada respuesta correcta
+    lo reduce en RITMO_PASO_SEG (más velocidad) y cada 429/5xx o error de red lo
+    duplica. Un Retry-After del servidor bloquea el host hasta la hora indicada.
+    """
+
+    def __init__(self, intervalo=SLEEP_BETWEEN_DIAS, minimo=RITMO_MIN_SEG, maximo=RITMO_MAX_SEG, paso=RITMO_PASO_SEG):
+        self.intervalo = intervalo
+        self.minimo = minimo
+        self.maximo = maximo
+        self.paso = paso
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        # Reserva el siguiente hueco bajo el lock y duerme fuera de él
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+    def exito(self):
+        with self._lock:
+            self.intervalo = max(self.minimo, self.intervalo - self.paso)
+
+    def penalizar(self, retry_after=None):
+        with self._lock:
+            self.intervalo = min(self.maximo, max(self.intervalo, self.minimo) * 2)
+            if retry_after:
+                self._siguiente = max(self._siguiente, time.monotonic() + retry_after)
+
+_controladores_host = {}
+
+def controlador_host(url):
+    host = urlparse(url).netloc.lower()
+    with _lock_semaforos:
+        ctrl = _controladores_host.get(host)
+        if ctrl is None:
+            ctrl = ControladorRitmo()
+            _controladores_host[host] = ctrl
+    return ctrl
+
+def _segundos_retry_after(valor):
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, (fecha - datetime.now(fecha.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def peticion_con_reintentos(url, timeout, reintentos=RETRIES, **kwargs):
+    """
+    GET con ritmo adaptativo por host. Reintenta 429, 5xx y errores de red con
+    backoff exponencial con jitter, respetando Retry-After si viene en la respuesta.
+    """
+    ctrl = controlador_host(url)
+    for intento in range(reintentos + 1):
+        ctrl.esperar()
+        try:
+            res = SESSION.get(url, timeout=timeout, **kwargs)
+        # Cuerpos cortados a mitad (ChunkedEncodingError) o mal comprimidos también son transitorios
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError) as e:
+            if intento == reintentos:
+                raise
+            ctrl.penalizar()
+            espera = BACKOFF_BASE_SEG * (2 ** intento) + random.uniform(0, BACKOFF_BASE_SEG)
+            print(f"[ritmo] {type(e).__name__} en {url}. Reintento en {espera:.1f}s...")
+            time.sleep(espera)
+            continue
+
+        if res.status_code == 429 or res.status_code >= 500:
+            retry_after = _segundos_retry_after(res.headers.get("Retry-After"))
+            ctrl.penalizar(retry_after)
+            if intento == reintentos:
+                return res
+            espera = BACKOFF_BASE_SEG * (2 ** intento) + random.uniform(0, BACKOFF_BASE_SEG)
+            print(f"[ritmo] HTTP {res.status_code} en {url} (intervalo {ctrl.intervalo:.1f}s). Reintento en {espera:.1f}s...")
+            time.sleep(espera)
+            continue
+
+        ctrl.exito()
+        return res
+# --8<-- [end:control_ritmo]
 
 # --8<-- [start:obtener_snapshot_url]
 def obtener_snapshot_url(original_url, fecha_str):
     wayback_api = f'https://archive.org/wayback/available?url={original_url}&timestamp={fecha_str}'
     try:
-        res = requests.get(wayback_api, timeout=WAYBACK_TIMEOUT)
+        res = peticion_con_reintentos(wayback_api, WAYBACK_TIMEOUT)
         data = res.json()
         snapshots = data.get('archived_snapshots', {})
         if snapshots and 'closest' in snapshots:
@@ -23,48 +172,266 @@ def obtener_snapshot_url(original_url, fecha_str):
         return None
 # --8<-- [end:obtener_snapshot_url]
 
+# Motor rápido: parser lxml en modo "target", sin construir el árbol del documento.
+# Solo se materializan los encabezados h1/h2/h3 (texto + clases).
+class _RecolectorEncabezados:
+    ETIQUETAS = ("h1", "h2", "h3")
+    SIN_TEXTO = ("script", "style", "template")  # BeautifulSoup tampoco los incluye en get_text
+
+    def __init__(self):
+        self.encabezados = []  # [partes_texto, clases] en orden de documento
+        self._abiertos = []
+        self._pila = []
+        self._buffer = []
+        self._sin_texto = 0
+
+    def _volcar(self):
+        # Igual que get_text(strip=True): cada cadena se recorta y las vacías se descartan
+        if self._buffer:
+            cadena = "".join(self._buffer).strip()
+            self._buffer = []
+            if cadena and not self._sin_texto:
+                for encabezado in self._abiertos:
+                    encabezado[0].append(cadena)
+
+    def start(self, tag, attrib):
+        self._volcar()
+        encabezado = None
+        if tag in self.ETIQUETAS:
+            encabezado = [[], " ".join(attrib.get("class", "").split())]
+            self.encabezados.append(encabezado)
+            self._abiertos.append(encabezado)
+        elif tag in self.SIN_TEXTO:
+            self._sin_texto += 1
+        self._pila.append((tag, encabezado))
+
+    def end(self, tag):
+        self._volcar()
+        if not self._pila:
+            return
+        tag, encabezado = self._pila.pop()
+        if encabezado is not None:
+            self._abiertos.remove(encabezado)
+        elif tag in self.SIN_TEXTO:
+            self._sin_texto -= 1
+
+    def data(self, data):
+        if self._abiertos:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        self._volcar()
+
+    def close(self):
+        self._volcar()
+        return [("".join(partes), clases) for partes, clases in self.encabezados]
+
+# libxml2 sigue las reglas de HTML4 y cierra un h1/h2/h3 en cuanto se abre dentro uno de
+# estos bloques, con lo que su texto se pierde; html.parser (BeautifulSoup) no lo hace.
+_CIERRAN_ENCABEZADO = ("p", "li", "table", "form", "fieldset", "plaintext")
+_ETIQUETA_RE = re.compile(r"<(/?)(h[1-3]|%s)(?=[\s/>])" % "|".join(_CIERRAN_ENCABEZADO), re.I)
+
+def _bloque_en_encabezado(html):
+    """True si algún h1/h2/h3 contiene un bloque que libxml2 cerraría (falsos positivos inocuos)."""
+    abiertos = 0
+    for m in _ETIQUETA_RE.finditer(html):
+        cierre, tag = m.group(1), m.group(2).lower()
+        if tag[0] == "h" and tag[1:].isdigit():
+            abiertos = max(abiertos - 1, 0) if cierre else abiertos + 1
+        elif abiertos and not cierre:
+            return True
+    return False
+
+def _encabezados_lxml(html):
+    if isinstance(html, bytes):
+        # Misma detección de codificación que BeautifulSoup
+        html = UnicodeDammit(html, is_html=True).unicode_markup or ""
+    if _bloque_en_encabezado(html):
+        return _encabezados_bs4(html)
+    parser = etree.HTMLParser(target=_RecolectorEncabezados(), recover=True)
+    parser.feed(html)
+    return parser.close()
+
+def _encabezados_bs4(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [
+        (t.get_text(strip=True), " ".join(t.get('class', [])) if t.get('class') else "")
+        for t in soup.find_all(['h1', 'h2', 'h3'])
+    ]
+
+MOTORES_ENCABEZADOS = {"bs4": _encabezados_bs4}
+if etree is not None:
+    MOTORES_ENCABEZADOS["lxml"] = _encabezados_lxml
+
 # --8<-- [start:extraer_titulares]
-def extraer_titulares(snapshot_url, fecha_str, fuente=None):
+def descargar_snapshot(snapshot_url, fuente=None, fecha_str=None):
+    # Primero la caché local; solo se guardan respuestas 200 con contenido
+    contenido = cache.obtener(snapshot_url)
+    if contenido is not None:
+        # Acierto de caché: no cuenta como descarga (ni bytes ni latencia de fetch)
+        metricas.sumar("aciertos_cache", 1, fuente)
+        metricas.sumar("bytes_cache", len(contenido), fuente)
+        if fecha_str:
+            metricas.registrar_dia(fuente, fecha_str, cache=True)
+        # También se archiva: la caché puede venir de una ejecución con el archivo desactivado
+        if ARCHIVAR_HTML and fecha_str:
+            archivar_html(fuente, fecha_str, snapshot_url, contenido)
+        return contenido
+    with metricas.cronometro("fetch", fuente):
+        res = peticion_con_reintentos(snapshot_url, SNAPSHOT_TIMEOUT)
+    metricas.sumar("bytes_descargados", len(res.content), fuente)
+    if fecha_str:
+        metricas.registrar_dia(fuente, fecha_str, cache=False)
+    # Agotados los reintentos llega el 429/5xx: su página de error no es el snapshot
+    if not 200 <= res.status_code < 300:
+        res.raise_for_status()
+        raise requests.HTTPError(f"HTTP {res.status_code} en {snapshot_url}", response=res)
+    if res.status_code == 200 and res.content:
+        cache.guardar(snapshot_url, res.content)
+        # Copia permanente del HTML crudo para poder re-extraer sin volver a descargar
+        if ARCHIVAR_HTML and fecha_str:
+            archivar_html(fuente, fecha_str, snapshot_url, res.content)
+    return res.content
+
+def parsear_titulares(html, snapshot_url, fecha_str, fuente=None, motor=PARSER_TITULARES):
     titulares = []
-    try:
-        res = requests.get(snapshot_url, timeout=SNAPSHOT_TIMEOUT)
-        soup = BeautifulSoup(res.content, 'html.parser')
-        encabezados = soup.find_all(['h1', 'h2', 'h3'])
-        print(f"[{fuente}] {len(encabezados)} encabezados encontrados en {snapshot_url}")
-
-        for t in encabezados:
-            texto = t.get_text(strip=True)
-            clases = " ".join(t.get('class', [])) if t.get('class') else ""
-
-            if fuente == "THE TIMES":
-                if any(cls in clases for cls in [
-                    'responsive__HeadlineContainer-sc-3t8ix5-3',
-                    'responsive__Heading-sc-1k9kzho-1',
-                    'responsive__Title-sc-1ij0d4n-5'
-                ]) or len(texto.split()) > 3:
-                    titulares.append({
-                        "fecha": fecha_str,
-                        "titular": texto,
-                        "url_archivo": snapshot_url
-                    })
-            else:
-                if texto and len(texto.split()) > 3:
-                    titulares.append({
-                        "fecha": fecha_str,
-                        "titular": texto,
-                        "url_archivo": snapshot_url
-                    })
+    extraer = MOTORES_ENCABEZADOS.get(motor, _encabezados_bs4)
+    encabezados = extraer(html)
+    print(f"[{fuente}] {len(encabezados)} encabezados encontrados en {snapshot_url}")
+    metricas.sumar("encabezados", len(encabezados), fuente)
+    metricas.registrar_dia(fuente, fecha_str, encabezados=len(encabezados))
+
+    for texto, clases in encabezados:
+        if fuente == "THE TIMES":
+            if any(cls in clases for cls in [
+                'responsive__HeadlineContainer-sc-3t8ix5-3',
+                'responsive__Heading-sc-1k9kzho-1',
+                'responsive__Title-sc-1ij0d4n-5'
+            ]) or len(texto.split()) > 3:
+                titulares.append({
+                    "fecha": fecha_str,
+                    "titular": texto,
+                    "url_archivo": snapshot_url
+                })
+        else:
+            if texto and len(texto.split()) > 3:
+                titulares.append({
+                    "fecha": fecha_str,
+                    "titular": texto,
+                    "url_archivo": snapshot_url
+                })
+
+    return titulares
 
+def extraer_titulares(snapshot_url, fecha_str, fuente=None, motor=PARSER_TITULARES, relanzar=False):
+    # relanzar=True propaga el error (tras registrarlo) para distinguir un fallo de un día sin titulares
+    titulares = []
+    try:
+        # descargar_snapshot registra la latencia de fetch y los bytes solo si va a la red
+        t0 = time.perf_counter()
+        html = descargar_snapshot(snapshot_url, fuente=fuente, fecha_str=fecha_str)
+        t1 = time.perf_counter()
+        with metricas.cronometro("parse", fuente):
+            titulares = parsear_titulares(html, snapshot_url, fecha_str, fuente=fuente, motor=motor)
+        t2 = time.perf_counter()
+        metricas.sumar("titulares", len(titulares), fuente)
+        metricas.registrar_dia(fuente, fecha_str, fetch_s=round(t1 - t0, 4), parse_s=round(t2 - t1, 4),
+                               bytes=len(html), titulares=len(titulares))
     except Exception as e:
         log_error(f"[{fuente or 'GENERAL'}] Error accediendo a snapshot: {e}")
+        if relanzar:
+            raise
 
     return titulares
 # --8<-- [end:extraer_titulares]
 
+# El fichero de log se abre una sola vez; logging serializa las escrituras entre hilos
+_logger = logging.getLogger("scraper")
+_logger.setLevel(logging.ERROR)
+_logger.propagate = False
+
 def log_error(mensaje):
-    with open("scraping_log.txt", "a", errors="ignore") as f:
-        f.write(f"{datetime.now()} - {mensaje}\n")
+    if not _logger.handlers:
+        handler = logging.FileHandler(LOG_FILE, mode="a", errors="ignore")
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        _logger.addHandler(handler)
+    metricas.sumar("errores", 1)
+    _logger.error(mensaje)
         
+# --8<-- [start:obtener_capturas_cdx]
+def obtener_capturas_cdx(original_url, fecha_inicio_str, fecha_fin_str):
+    """
+    Resuelve con una sola consulta al índice CDX la captura más cercana a las
+    12:00 de cada día del rango. Devuelve {fecha_str: {"url", "digest"}} o
+    None si la consulta falla (el llamador usa entonces la URL directa).
+    """
+    params = {
+        "url": original_url,
+        "from": fecha_inicio_str,
+        "to": fecha_fin_str,
+        "output": "json",
+        "fl": "timestamp,original,digest",
+        "filter": "statuscode:200",
+        "collapse": "timestamp:10",  # como mucho una captura por hora
+    }
+    try:
+        with limite_host(CDX_API):
+            res = peticion_con_reintentos(CDX_API, WAYBACK_TIMEOUT, params=params)
+        res.raise_for_status()
+        filas = res.json() if res.text.strip() else []
+    except Exception as e:
+        log_error(f"Error consultando CDX para {original_url} ({fecha_inicio_str}-{fecha_fin_str}): {e}")
+        return None
+
+    capturas = {}
+    for timestamp, original, digest in filas[1:]:  # la primera fila es la cabecera
+        fecha_str = timestamp[:8]
+        hhmmss = timestamp[8:14].ljust(6, "0")
+        segundos = int(hhmmss[:2]) * 3600 + int(hhmmss[2:4]) * 60 + int(hhmmss[4:])
+        distancia = abs(segundos - 12 * 3600)
+        actual = capturas.get(fecha_str)
+        if actual is None or distancia < actual["distancia"]:
+            capturas[fecha_str] = {
+                "url": f"https://web.archive.org/web/{timestamp}/{original}",
+                "digest": digest,
+                "distancia": distancia,
+            }
+    for captura in capturas.values():
+        del captura["distancia"]
+    return capturas
+# --8<-- [end:obtener_capturas_cdx]
+
+# --8<-- [start:descargar_portada_condicional]
+def descargar_portada_condicional(url, estado, fuente=None):
+    """
+    GET condicional de la portada en vivo con ETag / If-Modified-Since.
+    `estado` guarda etag, last_modified y el hash del último cuerpo procesado y se
+    actualiza en sitio. Devuelve el HTML si la página cambió o None si no.
+    """
+    cabeceras = {}
+    if estado.get("etag"):
+        cabeceras["If-None-Match"] = estado["etag"]
+    if estado.get("last_modified"):
+        cabeceras["If-Modified-Since"] = estado["last_modified"]
+
+    res = peticion_con_reintentos(url, SNAPSHOT_TIMEOUT, headers=cabeceras)
+    if res.status_code == 304:
+        metricas.sumar("en_vivo_no_modificada", 1, fuente)
+        return None
+    res.raise_for_status()
+
+    estado["etag"] = res.headers.get("ETag")
+    estado["last_modified"] = res.headers.get("Last-Modified")
+    metricas.sumar("bytes_descargados", len(res.content), fuente)
+    # Hay servidores que ignoran las cabeceras condicionales: se compara también el contenido
+    huella = hashlib.sha256(res.content).hexdigest()
+    if huella == estado.get("hash"):
+        metricas.sumar("en_vivo_sin_cambios", 1, fuente)
+        return None
+    estado["hash"] = huella
+    return res.content
+# --8<-- [end:descargar_portada_condicional]
+
 def obtener_snapshot_url_directo(original_url, fecha_str):
     # Usa directamente la estructura estándar del snapshot con hora fija (12:00:00)
     snapshot_url = f"https://web.archive.org/web/{fecha_str}120000/{original_url.strip('/')}/"
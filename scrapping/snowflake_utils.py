@@ -1,13 +1,22 @@
 # snowflake_utils.py
 
 import snowflake.connector
+from snowflake.connector.pandas_tools import write_pandas
 import pandas as pd
 from datetime import datetime, timedelta
+
+from config import TABLA_INDICE_TITULARES, TABLA_MARCAS_TITULARES
 #prueba
 
-# --8<-- [start:obtener_ultima_fecha_en_snowflake]
-def obtener_ultima_fecha_en_snowflake(config, tabla):
-    ctx = snowflake.connector.connect(
+FECHA_INICIO_POR_DEFECTO = datetime.strptime("20240101", "%Y%m%d").date()
+
+# Filas de Wayback: las del modo en vivo no deben saltar días pendientes en la marca de agua
+# ni borrarse al re-extraer desde el archivo (no se podrían recuperar)
+CONDICION_WAYBACK = "url_archivo LIKE '%web.archive.org/%'"
+FILTRO_WAYBACK = f"WHERE {CONDICION_WAYBACK}"
+
+def conectar_snowflake(config):
+    return snowflake.connector.connect(
         user=config['user'],
         password=config['password'],
         account=config['account'],
@@ -15,25 +24,197 @@ def obtener_ultima_fecha_en_snowflake(config, tabla):
         database=config['database'],
         schema=config['schema']
     )
+
+def _fecha_inicio(tabla, ultima_fecha):
+    if ultima_fecha:
+        print(f"Última fecha en Snowflake para {tabla}: {ultima_fecha}")
+        return ultima_fecha + timedelta(days=1)
+    print(f"No se encontraron registros en {tabla}. Iniciando desde 2024-01-01.")
+    return FECHA_INICIO_POR_DEFECTO
+
+# --8<-- [start:obtener_ultima_fecha_en_snowflake]
+def obtener_ultima_fecha_en_snowflake(config, tabla, ctx=None):
+    # Si no se pasa una conexión abierta, se abre (y cierra) una propia
+    conexion_propia = ctx is None
+    if conexion_propia:
+        ctx = conectar_snowflake(config)
     cs = ctx.cursor()
     try:
         tabla_completa = f"{config['database']}.{config['schema']}.{tabla}"
-        cs.execute(f"SELECT MAX(fecha) FROM {tabla_completa}")
+        cs.execute(f"SELECT MAX(fecha) FROM {tabla_completa} {FILTRO_WAYBACK}")
         resultado = cs.fetchone()
-        if resultado and resultado[0]:
-            ultima_fecha = resultado[0]
-            print(f"Última fecha en Snowflake para {tabla}: {ultima_fecha}")
-            return ultima_fecha + timedelta(days=1)
-        else:
-            print(f"No se encontraron registros en {tabla}. Iniciando desde 2024-01-01.")
-            return datetime.strptime("20240101", "%Y%m%d").date()
+        return _fecha_inicio(tabla, resultado[0] if resultado else None)
     finally:
         cs.close()
-        ctx.close()
+        if conexion_propia:
+            ctx.close()
 # --8<-- [end:obtener_ultima_fecha_en_snowflake]
 
+def leer_marcas_titulares(config, ctx, marcas=TABLA_MARCAS_TITULARES):
+    """Devuelve {tabla: última fecha de Wayback cargada} de la tabla de marcas ({} si aún no existe)."""
+    if not marcas:
+        return {}
+    cs = ctx.cursor()
+    try:
+        cs.execute(f"SELECT tabla, ultima_fecha FROM {config['database']}.{config['schema']}.{marcas}")
+        return dict(cs.fetchall())
+    except snowflake.connector.errors.ProgrammingError:
+        return {}
+    finally:
+        cs.close()
+
+def obtener_ultimas_fechas_en_snowflake(config, tablas, ctx):
+    """
+    Devuelve {tabla: fecha_inicio} para todas las tablas con una sola consulta
+    UNION ALL. Si alguna tabla aún no existe, se consulta tabla a tabla. La tabla
+    de marcas cubre los días cargados que no insertaron filas (titulares ya vistos).
+    """
+    marcas = leer_marcas_titulares(config, ctx)
+    consultas = [
+        f"SELECT '{tabla}' AS tabla, MAX(fecha) AS ultima FROM {config['database']}.{config['schema']}.{tabla} {FILTRO_WAYBACK}"
+        for tabla in tablas
+    ]
+    cs = ctx.cursor()
+    try:
+        cs.execute("\nUNION ALL\n".join(consultas))
+        ultimas = dict(cs.fetchall())
+    except snowflake.connector.errors.ProgrammingError:
+        ultimas = None
+    finally:
+        cs.close()
+
+    if ultimas is None:
+        fechas = {}
+        for tabla in tablas:
+            try:
+                fechas[tabla] = obtener_ultima_fecha_en_snowflake(config, tabla, ctx)
+            except snowflake.connector.errors.ProgrammingError:
+                fechas[tabla] = _fecha_inicio(tabla, None)
+            if marcas.get(tabla):
+                fechas[tabla] = max(fechas[tabla], marcas[tabla] + timedelta(days=1))
+        return fechas
+    return {tabla: _fecha_inicio(tabla, max(filter(None, (ultimas.get(tabla), marcas.get(tabla))), default=None))
+            for tabla in tablas}
+
+# --8<-- [start:indice_titulares]
+def _huella_sql(alias):
+    """Huella de (fuente, titular normalizado): minúsculas, sin espacios extremos ni repetidos."""
+    return (f"SHA1({alias}.fuente || '|' || "
+            f"REGEXP_REPLACE(LOWER(TRIM({alias}.titular)), '[[:space:]]+', ' '))")
+
+def preparar_indice_titulares(cs, indice_completo, tabla_completa, fuente):
+    """Crea el índice de primera aparición y, la primera vez para una fuente, lo puebla desde su tabla."""
+    cs.execute(f"""
+        CREATE TABLE IF NOT EXISTS {indice_completo} (
+            huella STRING,
+            fuente STRING,
+            titular STRING,
+            first_seen DATE,
+            last_seen DATE
+        );
+    """)
+    cs.execute(f"SELECT COUNT(*) FROM {indice_completo} WHERE fuente = %s", (fuente,))
+    if cs.fetchone()[0] == 0:
+        cs.execute(f"""
+            INSERT INTO {indice_completo} (huella, fuente, titular, first_seen, last_seen)
+            SELECT {_huella_sql('t')}, ANY_VALUE(t.fuente), ANY_VALUE(t.titular), MIN(t.fecha), MAX(t.fecha)
+            FROM {tabla_completa} t
+            WHERE t.fuente = %s
+            GROUP BY 1
+        """, (fuente,))
+
+def actualizar_indice_titulares(cs, indice_completo, tabla_origen):
+    """Registra los titulares de `tabla_origen` en el índice. Devuelve cuántos ya estaban."""
+    cs.execute(f"""
+        MERGE INTO {indice_completo} i
+        USING (
+            SELECT {_huella_sql('s')} AS huella, ANY_VALUE(s.fuente) AS fuente, ANY_VALUE(s.titular) AS titular,
+                   MIN(s.fecha) AS first_seen, MAX(s.fecha) AS last_seen
+            FROM {tabla_origen} s
+            GROUP BY 1
+        ) s
+          ON i.huella = s.huella
+        WHEN MATCHED THEN
+          UPDATE SET first_seen = LEAST(i.first_seen, s.first_seen),
+                     last_seen = GREATEST(i.last_seen, s.last_seen)
+        WHEN NOT MATCHED THEN
+          INSERT (huella, fuente, titular, first_seen, last_seen)
+          VALUES (s.huella, s.fuente, s.titular, s.first_seen, s.last_seen)
+    """)
+    fila = cs.fetchone()
+    return fila[1] if fila and len(fila) > 1 else 0
+
+def recalcular_primera_aparicion(cs, indice_completo, tabla_completa, tabla_dias, fuente):
+    """
+    Tras borrar días de `tabla_completa`, los titulares de `fuente` cuya primera aparición caía en
+    esos días pasan a la fila restante más antigua; sin filas restantes salen del índice y vuelven
+    a entrar donde se extraigan de nuevo (si no, se rechazarían para siempre).
+    """
+    cs.execute(f"""
+        MERGE INTO {indice_completo} i
+        USING (
+            SELECT x.huella, MIN(t.fecha) AS first_seen
+            FROM {indice_completo} x
+            LEFT JOIN {tabla_completa} t ON {_huella_sql('t')} = x.huella
+            WHERE x.fuente = %s AND x.first_seen IN (SELECT fecha FROM {tabla_dias})
+            GROUP BY x.huella
+        ) r
+          ON i.huella = r.huella
+        WHEN MATCHED AND r.first_seen IS NULL THEN DELETE
+        WHEN MATCHED THEN UPDATE SET first_seen = r.first_seen
+    """, (fuente,))
+
+def cargar_primeras_apariciones(cs, tabla_completa, tabla_tmp, indice_completo=None):
+    """
+    Inserta las filas de `tabla_tmp` en `tabla_completa` (MERGE por fecha, fuente y titular) dentro
+    de la transacción del llamador. Con índice solo entran titulares nunca vistos o vistos antes de su
+    first_seen (backfills, fusión de shards, re-extracción); en ese caso la fila de Wayback de la
+    antigua primera aparición se borra. Devuelve (insertadas, adelantados, conocidos).
+    """
+    adelantados = conocidos = 0
+    if indice_completo:
+        cs.execute(f"""
+            DELETE FROM {tabla_completa} t
+            USING (
+                SELECT i.huella, i.first_seen
+                FROM {indice_completo} i
+                JOIN (SELECT {_huella_sql('s')} AS huella, MIN(s.fecha) AS fecha
+                      FROM {tabla_tmp} s GROUP BY 1) s
+                  ON i.huella = s.huella AND s.fecha < i.first_seen
+            ) x
+            WHERE {_huella_sql('t')} = x.huella AND t.fecha = x.first_seen AND t.{CONDICION_WAYBACK}
+        """)
+        adelantados = cs.fetchone()[0]
+        origen = f"""
+            SELECT s.fecha, s.titular, s.url_archivo, s.fuente, s.idioma
+            FROM {tabla_tmp} s
+            LEFT JOIN {indice_completo} i ON i.huella = {_huella_sql('s')}
+            WHERE i.huella IS NULL OR s.fecha < i.first_seen
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {_huella_sql('s')} ORDER BY s.fecha, s.url_archivo) = 1
+        """
+    else:
+        origen = f"""
+            SELECT fecha, titular, url_archivo, fuente, idioma
+            FROM {tabla_tmp}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY fecha, fuente, titular ORDER BY url_archivo) = 1
+        """
+    # MERGE y no INSERT: un titular ya guardado ese día (p. ej. por el modo en vivo) no se duplica
+    cs.execute(f"""
+        MERGE INTO {tabla_completa} t
+        USING ({origen}) s
+          ON t.fecha = s.fecha AND t.fuente = s.fuente AND t.titular = s.titular
+        WHEN NOT MATCHED THEN
+          INSERT (fecha, titular, url_archivo, fuente, idioma)
+          VALUES (s.fecha, s.titular, s.url_archivo, s.fuente, s.idioma)
+    """)
+    insertadas = cs.fetchone()[0]
+    if indice_completo:
+        conocidos = actualizar_indice_titulares(cs, indice_completo, tabla_tmp)
+    return insertadas, adelantados, conocidos
+# --8<-- [end:indice_titulares]
+
 # --8<-- [start:subir_a_snowflake]
-def subir_a_snowflake(df, config, tabla):
+def subir_a_snowflake(df, config, tabla, ctx=None, indice=TABLA_INDICE_TITULARES, marcas=TABLA_MARCAS_TITULARES):
     if df.empty:
         print(f"No hay datos para subir a {tabla}.")
         return
@@ -41,14 +222,9 @@ def subir_a_snowflake(df, config, tabla):
     # Convertir 'fecha' a datetime.date
     df["fecha"] = pd.to_datetime(df["fecha"], format="%Y%m%d").dt.date
 
-    ctx = snowflake.connector.connect(
-        user=config['user'],
-        password=config['password'],
-        account=config['account'],
-        warehouse=config['warehouse'],
-        database=config['database'],
-        schema=config['schema']
-    )
+    conexion_propia = ctx is None
+    if conexion_propia:
+        ctx = conectar_snowflake(config)
     cs = ctx.cursor()
     try:
         tabla_completa = f"{config['database']}.{config['schema']}.{tabla}"
@@ -63,16 +239,112 @@ def subir_a_snowflake(df, config, tabla):
                 idioma STRING
             );
         """)
+        if marcas:
+            marcas_completa = f"{config['database']}.{config['schema']}.{marcas}"
+            cs.execute(f"""
+                CREATE TABLE IF NOT EXISTS {marcas_completa} (
+                    tabla STRING,
+                    ultima_fecha DATE,
+                    actualizado TIMESTAMP_NTZ
+                );
+            """)
 
-        insert_query = f"""
-            INSERT INTO {tabla_completa} (fecha, titular, url_archivo, fuente, idioma)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        rows_to_insert = df[["fecha", "titular", "url_archivo", "fuente", "idioma"]].values.tolist()
-        cs.executemany(insert_query, rows_to_insert)
+        # Carga en bloque: DataFrame → tabla temporal (Parquet vía write_pandas) → MERGE.
+        # El MERGE sobre (fecha, fuente, titular) hace que relanzar un día ya cargado no duplique filas.
+        tabla_tmp = f"TMP_{tabla}"
+        cs.execute(f"CREATE OR REPLACE TEMP TABLE {tabla_tmp} LIKE {tabla_completa}")
+        filas = df[["fecha", "titular", "url_archivo", "fuente", "idioma"]]
+        ok, _, nrows, _ = write_pandas(
+            ctx, filas, table_name=tabla_tmp,
+            database=config['database'], schema=config['schema'], quote_identifiers=False
+        )
+        if not ok:
+            raise RuntimeError(f"write_pandas falló al cargar {tabla_tmp}.")
+
+        indice_completo = None
+        if indice:
+            indice_completo = f"{config['database']}.{config['schema']}.{indice}"
+            preparar_indice_titulares(cs, indice_completo, tabla_completa, filas["fuente"].iloc[0])
 
-        print(f"{len(df)} filas insertadas en {tabla}.")
+        cs.execute("BEGIN")
+        try:
+            # Solo entran primeras apariciones; los titulares ya conocidos solo mueven last_seen
+            insertadas, adelantados, conocidos = cargar_primeras_apariciones(cs, tabla_completa, tabla_tmp, indice_completo)
+            if marcas:
+                cs.execute(f"""
+                    MERGE INTO {marcas_completa} m
+                    USING (SELECT MAX(fecha) AS ultima_fecha FROM {tabla_tmp} {FILTRO_WAYBACK}) s
+                      ON m.tabla = '{tabla}'
+                    WHEN MATCHED AND s.ultima_fecha IS NOT NULL THEN
+                      UPDATE SET ultima_fecha = GREATEST(m.ultima_fecha, s.ultima_fecha), actualizado = CURRENT_TIMESTAMP()
+                    WHEN NOT MATCHED AND s.ultima_fecha IS NOT NULL THEN
+                      INSERT (tabla, ultima_fecha, actualizado) VALUES ('{tabla}', s.ultima_fecha, CURRENT_TIMESTAMP())
+                """)
+            cs.execute("COMMIT")
+        except Exception:
+            cs.execute("ROLLBACK")
+            raise
+
+        if indice:
+            print(f"{insertadas} filas insertadas en {tabla} ({nrows - insertadas} repetidas descartadas, "
+                  f"{conocidos} titulares ya vistos actualizados en {indice}, "
+                  f"{adelantados} adelantados a su primera aparición).")
+        else:
+            print(f"{insertadas} filas insertadas en {tabla} ({nrows - insertadas} duplicadas descartadas).")
     finally:
         cs.close()
-        ctx.close()
+        if conexion_propia:
+            ctx.close()
 # --8<-- [end:subir_a_snowflake]
+
+# --8<-- [start:reemplazar_dias_en_snowflake]
+def reemplazar_dias_en_snowflake(df, dias, config, tabla, ctx, indice=TABLA_INDICE_TITULARES, fuente=None):
+    """
+    Sustituye en una sola transacción las filas de Wayback de `tabla` de los días
+    indicados (fechas YYYYMMDD) por las de `df`. Se usa al re-extraer titulares
+    desde el archivo de HTML con reglas nuevas; las filas del modo en vivo se
+    conservan. Con índice, un titular solo se inserta el primer día en que aparece y
+    la primera aparición de los titulares de esos días se recalcula.
+    """
+    tabla_completa = f"{config['database']}.{config['schema']}.{tabla}"
+    df_dias = pd.DataFrame({"fecha": pd.to_datetime(sorted(dias), format="%Y%m%d").date})
+    filas = df[["fecha", "titular", "url_archivo", "fuente", "idioma"]].copy()
+    filas["fecha"] = pd.to_datetime(filas["fecha"], format="%Y%m%d").dt.date
+
+    cs = ctx.cursor()
+    try:
+        cs.execute(f"CREATE OR REPLACE TEMP TABLE TMP_DIAS_{tabla} (fecha DATE)")
+        cs.execute(f"CREATE OR REPLACE TEMP TABLE TMP_{tabla} LIKE {tabla_completa}")
+        for nombre, datos in ((f"TMP_DIAS_{tabla}", df_dias), (f"TMP_{tabla}", filas)):
+            if datos.empty:
+                continue
+            ok, _, _, _ = write_pandas(
+                ctx, datos, table_name=nombre,
+                database=config['database'], schema=config['schema'], quote_identifiers=False
+            )
+            if not ok:
+                raise RuntimeError(f"write_pandas falló al cargar {nombre}.")
+
+        fuente = fuente or (filas["fuente"].iloc[0] if not filas.empty else None)
+        indice_completo = None
+        if indice and fuente:
+            indice_completo = f"{config['database']}.{config['schema']}.{indice}"
+            preparar_indice_titulares(cs, indice_completo, tabla_completa, fuente)
+
+        cs.execute("BEGIN")
+        cs.execute(f"""
+            DELETE FROM {tabla_completa}
+            WHERE fecha IN (SELECT fecha FROM TMP_DIAS_{tabla}) AND {CONDICION_WAYBACK}
+        """)
+        borradas = cs.fetchone()[0]
+        if indice_completo:
+            recalcular_primera_aparicion(cs, indice_completo, tabla_completa, f"TMP_DIAS_{tabla}", fuente)
+        insertadas, _, _ = cargar_primeras_apariciones(cs, tabla_completa, f"TMP_{tabla}", indice_completo)
+        cs.execute("COMMIT")
+        print(f"{tabla}: {len(dias)} días re-extraídos ({borradas} filas borradas, {insertadas} insertadas).")
+    except Exception:
+        cs.execute("ROLLBACK")
+        raise
+    finally:
+        cs.close()
+# --8<-- [end:reemplazar_dias_en_snowflake]